@@ -2,10 +2,28 @@
 # Created: 2025-11-22
 # Inline prompt boxes - no external CLIP Text Encode nodes needed!
 
+import json
+
 import torch
 from nodes import MAX_RESOLUTION
 import folder_paths
 
+from .easyregion.attention import RegionAttentionMask
+from .easyregion.instrumentation import logger, span
+from .easyregion.encoding import (
+    ENCODE_CACHE, PromptEncodingCache, clip_identity, compose_with_background, encode_prompts,
+)
+from .easyregion.layout import (
+    parse_layouts, parse_resolutions, parse_strengths, region_area_array, region_box_array, resolve_region_values,
+)
+from .easyregion.masks import (
+    FEATHER_FALLOFFS, RegionMaskStack, feather_sizes_for, mask_pyramid, rectangle_union,
+    resolve_latent_boxes,
+)
+from .easyregion.planner import plan_memory
+from .easyregion.results import RESULT_CACHE, cached_result, content_hash, region_inputs_hash
+from .easyregion.tiling import tile_conditioning, tile_grid
+
 class EasyRegionSimple:
     """
     ALL-IN-ONE regional prompting with inline text inputs!
@@ -48,6 +66,10 @@ class EasyRegionSimple:
                     "multiline": True,
                     "tooltip": "Region 4 - Fourth region/box (see canvas below)"
                 }),
+                "merge_duplicate_regions": ("BOOLEAN", {
+                    "default": True,
+                    "tooltip": "Regions with the same prompt and strength whose boxes together form a rectangle become one conditioning block (fewer model evaluations per step)"
+                }),
             },
             "hidden": {
                 "extra_pnginfo": "EXTRA_PNGINFO",
@@ -78,53 +100,54 @@ How to use:
 
 Compatible: SD1.5, SD2.x, SDXL"""
 
+    # Default template boxes (fallback if no data from UI)
+    DEFAULT_BOXES = [
+        [41, 102, 138, 307, 1.0],   # Region 1 - percentage-based for 512x512
+        [360, 77, 140, 348, 1.0]    # Region 2 - percentage-based for 512x512
+    ]
+
+    @classmethod
+    def IS_CHANGED(cls, extra_pnginfo=None, unique_id=None, region_boxes="", **kwargs):
+        return region_inputs_hash(cls, region_boxes, unique_id, 512, 512, kwargs)
+
     def encode_regions(self, clip, background_prompt, region1_prompt, extra_pnginfo, unique_id, region_boxes="",
-                      region2_prompt="", region3_prompt="", region4_prompt=""):
+                      region2_prompt="", region3_prompt="", region4_prompt="", merge_duplicate_regions=True):
         """Encode all prompts and apply regional conditioning."""
 
-        # Default template boxes (fallback if no data from UI)
-        values = [
-            [41, 102, 138, 307, 1.0],   # Region 1 - percentage-based for 512x512
-            [360, 77, 140, 348, 1.0]    # Region 2 - percentage-based for 512x512
-        ]
-        resolutionX = 512
-        resolutionY = 512
-
-        # First try to parse from hidden widget (works on fresh nodes)
-        if region_boxes:
-            try:
-                import json
-                parsed = json.loads(region_boxes)
-                if parsed and len(parsed) > 0:
-                    values = parsed
-                    print(f"ℹ️  Using region boxes from widget: {values}")
-            except Exception as e:
-                print(f"⚠️  Failed to parse region_boxes widget: {e}")
-
-        # Fallback: Get region data from saved workflow (overrides if available)
-        try:
-            if extra_pnginfo and "workflow" in extra_pnginfo and "nodes" in extra_pnginfo["workflow"]:
-                for node in extra_pnginfo["workflow"]["nodes"]:
-                    if node["id"] == int(unique_id):
-                        saved_values = node["properties"].get("values", [])
-                        if saved_values:  # Only override if we actually have saved values
-                            values = saved_values
-                        resolutionX = node["properties"].get("width", 512)
-                        resolutionY = node["properties"].get("height", 512)
-                        break
-        except Exception as e:
-            print(f"ℹ️  Using default template boxes and canvas size 512x512")
-
-        # Collect all non-empty prompts
-        prompts = [background_prompt, region1_prompt, region2_prompt, region3_prompt, region4_prompt]
-
-        # Encode each prompt using CLIP (standard SD/SDXL encoding)
+        # Boxes from the hidden widget, overridden by the saved workflow if available
+        values, resolutionX, resolutionY = resolve_region_values(
+            region_boxes, extra_pnginfo, unique_id, self.DEFAULT_BOXES, 512, 512
+        )
+
+        # Unchanged inputs (e.g. only the seed changed) reuse the previous result
+        result_key = content_hash(
+            type(self).__name__, values, resolutionX, resolutionY, clip_identity(clip),
+            [background_prompt, region1_prompt, region2_prompt, region3_prompt, region4_prompt],
+            merge_duplicate_regions,
+        )
+        cached = cached_result(result_key)
+        if cached is not None:
+            return cached
+
+        with span("node", node=type(self).__name__) as node_span:
+            result = self._encode_area_regions(clip, values, resolutionX, resolutionY, [
+                background_prompt, region1_prompt, region2_prompt, region3_prompt, region4_prompt,
+            ], merge_duplicate_regions)
+            node_span.add_bytes(result)
+        logger.info("✅ EasyRegion: %d conditioning blocks in %.1f ms", len(result[0]), node_span.seconds * 1000)
+
+        RESULT_CACHE.put(result_key, result)
+        return result
+
+    def _encode_area_regions(self, clip, values, resolutionX, resolutionY, prompts, merge_duplicates=True):
+        """Area conditioning for the background and each region prompt (region i uses values[i])."""
+
+        # Encode all non-empty prompts together using CLIP (standard SD/SDXL encoding)
+        # Cached across runs, duplicates encoded once, empty prompts map to None
         encoded_conditionings = []
-        for prompt in prompts:
-            if prompt and prompt.strip():  # Only encode non-empty prompts
-                # Standard CLIP encoding for SD/SDXL
-                tokens = clip.tokenize(prompt)
-                cond, pooled = clip.encode_from_tokens(tokens, return_pooled=True)
+        for encoded in encode_prompts(clip, prompts):
+            if encoded is not None:
+                cond, pooled = encoded
                 encoded_conditionings.append([[cond, {"pooled_output": pooled}]])
             else:
                 encoded_conditionings.append(None)
@@ -137,20 +160,16 @@ Compatible: SD1.5, SD2.x, SDXL"""
             for t in encoded_conditionings[0]:
                 c.append(t)
 
-        # Process each region
+        # Process each region - boxes and strengths validated up front, malformed rows skipped
+        boxes, box_strengths, valid = region_area_array(values, default_strength=2.0)
+        box_rows, box_strengths, valid = boxes.tolist(), box_strengths.tolist(), valid.tolist()
+        regions = []  # (region index, area, strength)
         for i in range(1, min(len(encoded_conditionings), len(values) + 1)):
-            if encoded_conditionings[i] is None:
+            if encoded_conditionings[i] is None or not valid[i-1]:
                 continue
 
-            if i - 1 >= len(values):
-                continue
-
-            try:
-                x, y = int(values[i-1][0]), int(values[i-1][1])
-                w, h = int(values[i-1][2]), int(values[i-1][3])
-                strength = float(values[i-1][4]) if len(values[i-1]) > 4 else 2.0
-            except (IndexError, ValueError, TypeError):
-                continue
+            x, y, w, h = box_rows[i-1]
+            strength = box_strengths[i-1]
 
             # Skip if fullscreen (already added as background)
             if x == 0 and y == 0 and w == resolutionX and h == resolutionY:
@@ -165,11 +184,33 @@ Compatible: SD1.5, SD2.x, SDXL"""
             if w == 0 or h == 0:
                 continue
 
+            regions.append((i, (h // 8, w // 8, y // 8, x // 8), max(0.0, min(10.0, strength))))
+
+        # Regions sharing a prompt and strength become one block when their
+        # areas together form a single rectangle
+        merged = {}  # first region index -> merged area; None marks absorbed regions
+        if merge_duplicates:
+            groups = {}
+            for i, area, strength in regions:
+                groups.setdefault((prompts[i], strength), []).append((i, area))
+            for members in groups.values():
+                if len(members) < 2:
+                    continue
+                union = rectangle_union([area for _, area in members])
+                if union is not None:
+                    merged[members[0][0]] = union
+                    merged.update((i, None) for i, _ in members[1:])
+
+        for i, area, strength in regions:
+            area = merged.get(i, area)
+            if area is None:
+                continue
+
             # Apply area to conditioning
             for t in encoded_conditionings[i]:
                 n = [t[0], t[1].copy()]
-                n[1]['area'] = (h // 8, w // 8, y // 8, x // 8)
-                n[1]['strength'] = max(0.0, min(10.0, strength))
+                n[1]['area'] = area
+                n[1]['strength'] = strength
                 n[1]['min_sigma'] = 0.0
                 n[1]['max_sigma'] = 99.0
                 c.append(n)
@@ -272,6 +313,33 @@ class EasyRegionMask:
                     "step": 0.1,
                     "tooltip": "Region 4 strength (recommended: 2.5-3.0, higher values may cause artifacts)"
                 }),
+                "dense_attention_mask": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Build full (text+image)² attention tensors up front (legacy behaviour, ~1 GB per region at 1344x768). OFF = compact masks expanded on demand"
+                }),
+                "background_mode": (["text", "embeddings"], {
+                    "default": "text",
+                    "tooltip": "How the background joins each region prompt. text = 'background, region' re-encoded per region. embeddings = background encoded once and its tokens prepended to each region (faster, slightly different results)"
+                }),
+                "feather_width": ("INT", {
+                    "default": 6,
+                    "min": 1,
+                    "max": 64,
+                    "step": 1,
+                    "tooltip": "Feather band in latent pixels (1 latent pixel = 8 image pixels), capped at a quarter of the region size. Only used when soften_masks is on"
+                }),
+                "feather_falloff": (list(FEATHER_FALLOFFS), {
+                    "default": "linear",
+                    "tooltip": "Feather curve: linear (original), smoothstep (softer ends), gaussian (gentle fade-in, fuller interior)"
+                }),
+                "merge_duplicate_regions": ("BOOLEAN", {
+                    "default": True,
+                    "tooltip": "Regions with the same prompt become one conditioning block with a combined mask (fewer model evaluations per step). OFF = one block per box"
+                }),
+                "mask_pyramid": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Also attach each region mask at 1/2, 1/4 and 1/8 of the latent size (conditioning key 'mask_pyramid'), built once, for attention patches that would otherwise resize the mask every step"
+                }),
             },
             "hidden": {
                 "extra_pnginfo": "EXTRA_PNGINFO",
@@ -295,197 +363,279 @@ Quick Start:
 
 See README for model-specific tips and recommended settings."""
 
+    # Default template boxes (fallback if no data from UI)
+    # Matches user's 1344x768 workflow with 3 regions
+    DEFAULT_BOXES = [
+        [0, 320, 368, 462, 2.0],      # Region 1 - red sports car (left)
+        [448, 64, 384, 704, 2.0],     # Region 2 - giraffe (center-right)
+        [945, 0, 378, 256, 2.0]       # Region 3 - blue bird (top-right)
+    ]
+
+    @classmethod
+    def IS_CHANGED(cls, extra_pnginfo=None, unique_id=None, region_boxes="", width=1344, height=768, **kwargs):
+        return region_inputs_hash(cls, region_boxes, unique_id, width, height, kwargs)
+
     def encode_regions_mask(self, clip, width, height, background_strength, soften_masks, background_prompt, region1_prompt,
                            extra_pnginfo, unique_id, region_boxes="",
                            region1_strength=0.7, region2_prompt="", region2_strength=0.8,
-                           region3_prompt="", region3_strength=1.5, region4_prompt="", region4_strength=2.5):
+                           region3_prompt="", region3_strength=1.5, region4_prompt="", region4_strength=2.5,
+                           dense_attention_mask=False, background_mode="text", feather_width=6, feather_falloff="linear",
+                           merge_duplicate_regions=True, mask_pyramid=False):
         """Encode all prompts and apply mask-based regional conditioning."""
 
-        # Default template boxes (fallback if no data from UI)
-        # Matches user's 1344x768 workflow with 3 regions
-        values = [
-            [0, 320, 368, 462, 2.0],      # Region 1 - red sports car (left)
-            [448, 64, 384, 704, 2.0],     # Region 2 - giraffe (center-right)
-            [945, 0, 378, 256, 2.0]       # Region 3 - blue bird (top-right)
-        ]
-
-        # First try to parse from hidden widget (works on fresh nodes)
-        if region_boxes:
-            try:
-                import json
-                parsed = json.loads(region_boxes)
-                if parsed and len(parsed) > 0:
-                    values = parsed
-                    print(f"ℹ️  Using region boxes from widget: {values}")
-            except Exception as e:
-                print(f"⚠️  Failed to parse region_boxes widget: {e}")
-
-        # Fallback: Get region data from saved workflow (overrides if available)
-        try:
-            if extra_pnginfo and "workflow" in extra_pnginfo and "nodes" in extra_pnginfo["workflow"]:
-                for node in extra_pnginfo["workflow"]["nodes"]:
-                    if node["id"] == int(unique_id):
-                        saved_values = node["properties"].get("values", [])
-                        if saved_values:  # Only override if we actually have saved values
-                            values = saved_values
-                        # Override with property dimensions if available
-                        prop_width = node["properties"].get("width", width)
-                        prop_height = node["properties"].get("height", height)
-                        break
-        except Exception as e:
-            print(f"ℹ️  Using default template boxes and dimensions {width}x{height}")
-            prop_width = width
-            prop_height = height
-
-        # Collect all non-empty prompts
-        prompts = [background_prompt, region1_prompt, region2_prompt, region3_prompt, region4_prompt]
+        values, canvas_width, canvas_height = self.resolve_boxes(region_boxes, extra_pnginfo, unique_id, width, height)
+
+        return self.encode_mask_regions(
+            clip, width, height, values, canvas_width, canvas_height,
+            background_prompt, background_strength,
+            [region1_prompt, region2_prompt, region3_prompt, region4_prompt],
+            [region1_strength, region2_strength, region3_strength, region4_strength],
+            soften_masks, feather_width, feather_falloff, background_mode, dense_attention_mask,
+            merge_duplicate_regions, mask_pyramid,
+        )
+
+    def resolve_boxes(self, region_boxes, extra_pnginfo, unique_id, width, height):
+        """Resolve region boxes and canvas size from the hidden widget / saved workflow."""
+        return resolve_region_values(region_boxes, extra_pnginfo, unique_id, self.DEFAULT_BOXES, width, height)
+
+    def encode_mask_regions(self, clip, width, height, values, canvas_width, canvas_height,
+                            background_prompt, background_strength, region_prompts, region_strengths,
+                            soften_masks, feather_width, feather_falloff, background_mode, dense_attention_mask,
+                            merge_duplicates=True, pyramid=False, encode_cache=None):
+        """Shared mask-based pipeline for any number of regions (region i uses values[i])."""
+
+        # Unchanged inputs (e.g. only the seed changed) reuse the previous result
+        # Dense attention masks are too large to keep around
+        result_key = content_hash(
+            type(self).__name__, values, canvas_width, canvas_height, width, height, clip_identity(clip),
+            background_prompt, background_strength, list(region_prompts), list(region_strengths),
+            soften_masks, feather_width, feather_falloff, background_mode, dense_attention_mask, merge_duplicates,
+            pyramid,
+        )
+        cached = cached_result(result_key)
+        if cached is not None:
+            return cached
 
         # Count non-empty regions (excluding background)
-        num_regions = sum(1 for p in prompts[1:] if p and p.strip())
+        num_regions = sum(1 for p in region_prompts if p and p.strip())
 
-        print(f"\n🎨 Regional Prompter - Processing:")
-        print(f"   Dimensions: {width}x{height} (latent: {width//8}x{height//8})")
-        print(f"   Background strength: {background_strength}")
-        print(f"   Region strengths: [{region1_strength}, {region2_strength}, {region3_strength}, {region4_strength}]")
-        print(f"   Regions: {num_regions} active (background + {num_regions} regions)")
-        print(f"   Soften masks: {soften_masks}")
-        print(f"   Default boxes: {values}")
+        logger.info(
+            "🎨 EasyRegion: %dx%d (latent %dx%d), %d regions, background strength %s, "
+            "soften %s (width %d, %s), background mode %s",
+            width, height, width // 8, height // 8, num_regions, background_strength,
+            "on" if soften_masks else "off", feather_width, feather_falloff, background_mode,
+        )
+        logger.debug("Region strengths: %s", list(region_strengths))
+        logger.debug("Boxes: %s", values)
 
         if num_regions > 4:
-            print(f"⚠️  Warning: {num_regions} regions detected. Most models work best with 3-4 regions maximum.")
-
+            logger.warning("⚠️  %d regions detected. Most models work best with 3-4 regions maximum.", num_regions)
+
+        layout = {
+            "values": values,
+            "canvas_width": canvas_width,
+            "canvas_height": canvas_height,
+            "background_prompt": background_prompt,
+            "region_prompts": list(region_prompts),
+            "region_strengths": list(region_strengths),
+        }
+        with span("node", node=type(self).__name__, regions=num_regions) as node_span:
+            combined_conditioning = self.build_layout_conditionings(
+                clip, width, height, [layout], background_strength, soften_masks,
+                feather_width, feather_falloff, background_mode, dense_attention_mask, merge_duplicates, pyramid,
+                encode_cache,
+            )[0]
+            node_span.add_bytes(combined_conditioning)
+
+        logger.info("✅ EasyRegion: %d conditioning blocks in %.1f ms",
+                    len(combined_conditioning), node_span.seconds * 1000)
+
+        result = (combined_conditioning,)
+        if not dense_attention_mask:
+            RESULT_CACHE.put(result_key, result)
+        return result
+
+    def build_layout_conditionings(self, clip, width, height, layouts, background_strength, soften_masks,
+                                   feather_width, feather_falloff, background_mode, dense_attention_mask,
+                                   merge_duplicates=True, pyramid=False, encode_cache=None):
+        """
+        Mask-based conditioning for several layouts in one pass.
+
+        Each layout is a dict with values (boxes), canvas_width, canvas_height,
+        background_prompt, region_prompts and region_strengths. Prompts from all
+        layouts are encoded together (each unique prompt once), and every box of
+        every layout goes into a single batched mask stack. With merge_duplicates,
+        regions of a layout that share a prompt become one conditioning block;
+        with pyramid, each region also carries its mask at every PYRAMID_FACTORS
+        level. Returns one conditioning list per layout.
+        """
         # Concatenate background to regional prompts for visual coherence
         # This ensures all regions share the same scene context
-        prompts_final = []
-        for i, prompt in enumerate(prompts):
-            if i == 0:  # Background
-                prompts_final.append(prompt if prompt and prompt.strip() else "")
-            else:  # Regional prompts - prepend background for unified composition
-                if prompt and prompt.strip():
+        # "embeddings" mode encodes the background once and joins it after encoding instead
+        compose_embeddings = background_mode == "embeddings"
+        layout_prompts = []
+        for layout in layouts:
+            background_prompt = layout["background_prompt"]
+            prompts_final = [background_prompt if background_prompt and background_prompt.strip() else ""]
+            for i, prompt in enumerate(layout["region_prompts"], 1):
+                if compose_embeddings:  # Regional prompts - background joined after encoding
+                    prompts_final.append(prompt if prompt and prompt.strip() else "")
+                elif prompt and prompt.strip():  # Regional prompts - prepend background for unified composition
                     combined = f"{background_prompt}, {prompt}" if background_prompt and background_prompt.strip() else prompt
                     prompts_final.append(combined)
-                    print(f"   📝 Region {i} combined prompt: '{combined[:60]}...'")
+                    logger.debug("Region %d combined prompt: '%s...'", i, combined[:60])
                 else:
                     prompts_final.append("")
+            layout_prompts.append(prompts_final)
+
+        latent_width = width // 8
+        latent_height = height // 8
+
+        # Gather the boxes of regions that have a prompt and a valid box, from every
+        # layout (boxes are validated once per values list by region_box_array)
+        region_refs = []  # (layout index, region index)
+        box_parts = []
+        canvas_parts = []
+        for layout_index, (layout, prompts_final) in enumerate(zip(layouts, layout_prompts)):
+            values = layout["values"]
+            count = max(0, min(len(prompts_final) - 1, len(values)))
+            boxes, valid = region_box_array(values)
+            selected = valid[:count] & torch.tensor([bool(p) for p in prompts_final[1:count + 1]], dtype=torch.bool)
+            rows = selected.nonzero().flatten()
+            box_parts.append(boxes[rows])
+            canvas_parts.append(
+                torch.tensor([int(layout["canvas_width"]), int(layout["canvas_height"])]).expand(len(rows), 2)
+            )
+            region_refs.extend((layout_index, k + 1) for k in rows.tolist())
+        box_rows = torch.cat(box_parts) if box_parts else torch.zeros((0, 4), dtype=torch.int64)
+        box_canvases = torch.cat(canvas_parts) if canvas_parts else torch.zeros((0, 2), dtype=torch.int64)
 
         # Encode each prompt using CLIP
         # ComfyUI's CLIP object handles multi-encoder complexity internally
-        encoded_conditionings = []
-
-        for prompt in prompts_final:
-            if prompt and prompt.strip():
-                tokens = clip.tokenize(prompt)
-                cond, pooled = clip.encode_from_tokens(tokens, return_pooled=True)
-                encoded_conditionings.append([[cond, {"pooled_output": pooled}]])
-            else:
-                encoded_conditionings.append(None)
+        # Unchanged prompts come from the shared encoding cache (box/strength tweaks skip CLIP)
+        # and the rest - across all layouts - are encoded once per unique prompt
+        encoded_prompts = encode_prompts(clip, [p for prompts_final in layout_prompts for p in prompts_final],
+                                         encode_cache)
+
+        layout_encodings = []
+        offset = 0
+        for prompts_final in layout_prompts:
+            encoded_layout = encoded_prompts[offset:offset + len(prompts_final)]
+            offset += len(prompts_final)
+            background_encoded = encoded_layout[0]
+            encoded_conditionings = []
+            for i, encoded in enumerate(encoded_layout):
+                if encoded is not None:
+                    if compose_embeddings and i > 0 and background_encoded is not None:
+                        encoded = compose_with_background(background_encoded, encoded)
+                    cond, pooled = encoded
+                    encoded_conditionings.append([[cond, {"pooled_output": pooled}]])
+                else:
+                    encoded_conditionings.append(None)
+            layout_encodings.append(encoded_conditionings)
+
+        pixel_boxes, latent_boxes, latent_extent, keep, feather_sizes = self._region_geometry(
+            box_rows, box_canvases, (width, height), soften_masks, feather_width,
+        )
+        kept = keep.nonzero().flatten().tolist()
+
+        # Group kept regions into conditioning blocks: (layout, prompt) when merging
+        # duplicates, otherwise one block per region
+        region_groups = {}
+        for mask_index, row in enumerate(kept):
+            layout_index, i = region_refs[row]
+            key = (layout_index, layout_prompts[layout_index][i]) if merge_duplicates else (layout_index, row)
+            region_groups.setdefault(key, (layout_index, []))[1].append(mask_index)
+        if len(region_groups) < len(kept):
+            logger.info("EasyRegion: merged %d regions sharing a prompt into %d conditioning blocks",
+                        len(kept), len(region_groups))
+
+        encoded_all = [enc for encoded_conditionings in layout_encodings for enc in encoded_conditionings if enc]
+        masks = None
+        memory_plan = None
+        if kept:
+            # Check the memory cost before allocating any mask - large resolutions
+            # fall back to reduced precision, or stop with a clear error
+            txt_tokens_per_region = [
+                t[0].shape[1]
+                for layout_index, members in region_groups.values()
+                for t in layout_encodings[layout_index][region_refs[kept[members[0]]][1]]
+            ]
+            cond_bytes = sum(t[0].numel() * t[0].element_size() for enc in encoded_all for t in enc)
+            with span("plan", regions=len(kept)):
+                memory_plan = plan_memory(
+                    len(kept), (latent_height, latent_width), txt_tokens_per_region, dense_attention_mask, cond_bytes,
+                    pyramid=pyramid,
+                )
+            logger.info("EasyRegion memory plan: %s", memory_plan.describe())
+            if memory_plan.downgraded:
+                logger.warning("⚠️  Reduced mask precision to stay within the memory budget")
+
+            # Region masks (1.0 inside box), feathered at the edges for visual blending
+            # if enabled (40-60px = 5-8 latent pixels by default). One (N, H, W)
+            # broadcast pass, deferred until the sampler moves the masks to its
+            # device and built there directly
+            masks = RegionMaskStack(latent_boxes[keep], (latent_height, latent_width), feather_sizes, feather_falloff,
+                                    memory_plan.mask_dtype)
 
         # Apply mask-based conditioning
-        combined_conditioning = []
-
-        # Mask tensor values: use 1.0 (full binary mask), let mask_strength param control intensity
+        # Mask tensor values: 1.0 (full binary mask, feathered edges), let mask_strength param control intensity
         # The per-region strength parameter in conditioning dict controls actual strength
-        mask_tensor_value = 1.0  # Always use binary mask (0.0 or 1.0)
+        results = [[] for _ in layouts]
 
         # Background (fullscreen - no mask)
         # Apply background_strength to allow users to reduce background influence
-        if encoded_conditionings[0]:
-            for t in encoded_conditionings[0]:
-                n = [t[0], t[1].copy()]
-                if background_strength != 1.0:
-                    # Scale the conditioning tensor by background_strength
-                    n[0] = t[0] * background_strength
-                combined_conditioning.append(n)
-
-        # Per-region strength values from inputs (not canvas)
-        region_strengths = [region1_strength, region2_strength, region3_strength, region4_strength]
+        for combined_conditioning, encoded_conditionings in zip(results, layout_encodings):
+            if encoded_conditionings[0]:
+                for t in encoded_conditionings[0]:
+                    n = [t[0], t[1].copy()]
+                    if background_strength != 1.0:
+                        # Scale the conditioning tensor by background_strength
+                        n[0] = t[0] * background_strength
+                    combined_conditioning.append(n)
 
         # Process each region with masks
-        latent_width = width // 8
-        latent_height = height // 8
-
-        for i in range(1, min(len(encoded_conditionings), len(values) + 1)):
-            if encoded_conditionings[i] is None:
-                continue
-
-            if i - 1 >= len(values):
-                continue
-
-            try:
-                x, y = int(values[i-1][0]), int(values[i-1][1])
-                w, h = int(values[i-1][2]), int(values[i-1][3])
+        # Regions of a layout that share a prompt become one block with a union mask
+        # and union attention pattern - one model evaluation per step instead of several
+        for layout_index, members in region_groups.values():
+            layout = layouts[layout_index]
+            encoded_conditionings = layout_encodings[layout_index]
+            region_strengths = layout["region_strengths"]
+            strengths = []
+            attention_boxes = []
+            for mask_index in members:
+                row = kept[mask_index]
+                i = region_refs[row][1]
                 # Use per-region strength from inputs instead of canvas values
                 strength = region_strengths[i-1] if i-1 < len(region_strengths) else 5.0
-            except (IndexError, ValueError, TypeError):
-                continue
-
-            # Get canvas dimensions
-            canvas_width = prop_width if 'prop_width' in locals() else width
-            canvas_height = prop_height if 'prop_height' in locals() else height
-
-            # Skip fullscreen (already added as background)
-            if x == 0 and y == 0 and w == canvas_width and h == canvas_height:
-                continue
-
-            # Scale to output dimensions if needed
-            if canvas_width != width or canvas_height != height:
-                x = int(x * width / canvas_width)
-                y = int(y * height / canvas_height)
-                w = int(w * width / canvas_width)
-                h = int(h * height / canvas_height)
-
-            # Clip to bounds
-            x = max(0, min(x, width))
-            y = max(0, min(y, height))
-            w = max(0, min(w, width - x))
-            h = max(0, min(h, height - y))
-
-            if w == 0 or h == 0:
-                continue
-
-            # Convert to latent space
-            x_latent = x // 8
-            y_latent = y // 8
-            w_latent = max(1, w // 8)
-            h_latent = max(1, h // 8)
-
-            # Create binary mask for region
-            mask = torch.zeros((1, latent_height, latent_width), dtype=torch.float32)
-
-            x_end = min(x_latent + w_latent, latent_width)
-            y_end = min(y_latent + h_latent, latent_height)
-
-            # Fill mask region with 1.0 (binary mask)
-            mask[0, y_latent:y_end, x_latent:x_end] = mask_tensor_value
-
-            print(f"   Region {i}: '{prompts[i][:40]}...'")
-            print(f"      Box: x={x}, y={y}, w={w}, h={h}")
-            print(f"      Latent: x={x_latent}, y={y_latent}, w={w_latent}, h={h_latent}")
-            print(f"      Mask: binary 1.0, Conditioning strength: {strength}")
-
-            # Create separate feathered mask for visual blending
-            # Keep original mask binary for attention control
-            feathered_mask = mask.clone()
-
-            # Apply feathering if enabled (gentle edge blending)
-            if soften_masks:
-                # Apply gaussian-like feather at edges (40-60px = 5-8 latent pixels)
-                feather_size = min(6, w_latent // 4, h_latent // 4)
-                if feather_size > 0:
-                    for edge_idx in range(feather_size):
-                        fade = (edge_idx + 1) / feather_size  # 0.0 to 1.0 gradient
-                        # Top edge
-                        if y_latent + edge_idx < y_end:
-                            feathered_mask[0, y_latent + edge_idx, x_latent:x_end] = fade
-                        # Bottom edge
-                        if y_end - 1 - edge_idx >= y_latent:
-                            feathered_mask[0, y_end - 1 - edge_idx, x_latent:x_end] = fade
-                        # Left edge
-                        if x_latent + edge_idx < x_end:
-                            feathered_mask[0, y_latent:y_end, x_latent + edge_idx] = torch.minimum(feathered_mask[0, y_latent:y_end, x_latent + edge_idx], torch.tensor(fade))
-                        # Right edge
-                        if x_end - 1 - edge_idx >= x_latent:
-                            feathered_mask[0, y_latent:y_end, x_end - 1 - edge_idx] = torch.minimum(feathered_mask[0, y_latent:y_end, x_end - 1 - edge_idx], torch.tensor(fade))
+                strengths.append(max(0.0, min(10.0, strength)))
+                x, y, w, h = pixel_boxes[row].tolist()
+                y_latent, y_end, x_latent, x_end = latent_boxes[row].tolist()
+                w_latent, h_latent = latent_extent[row].tolist()
+                attention_boxes.append((y_latent, y_end, x_latent, x_end))
+
+                logger.debug(
+                    "Region %d '%s...': box x=%d y=%d w=%d h=%d, latent x=%d y=%d w=%d h=%d, strength %s",
+                    i, layout["region_prompts"][i-1][:40], x, y, w, h, x_latent, y_latent, w_latent, h_latent, strength,
+                )
+            i = region_refs[kept[members[0]]][1]
+
+            # Merged regions keep their own strength by scaling their part of the
+            # union mask relative to the strongest one
+            strength = max(strengths)
+            weights = None
+            if len(set(strengths)) > 1 and strength > 0:
+                weights = [s / strength for s in strengths]
+            feathered_mask = masks.region(members if len(members) > 1 else members[0], weights)
+            if dense_attention_mask:
+                feathered_mask = feathered_mask.materialize()
+            levels = None
+            if pyramid:
+                # Resized once from the feathered mask - identical to per-step interpolation
+                levels = mask_pyramid(feathered_mask)
+                if dense_attention_mask:
+                    levels = {size: level if isinstance(level, torch.Tensor) else level.materialize()
+                              for size, level in levels.items()}
 
             # Apply mask-based conditioning with attention masking
             # Background concatenation provides scene context
@@ -493,49 +643,362 @@ See README for model-specific tips and recommended settings."""
             for t in encoded_conditionings[i]:
                 n = [t[0], t[1].copy()]
                 n[1]['mask'] = feathered_mask  # Feathered for smooth visual blending
-                n[1]['mask_strength'] = max(0.0, min(10.0, strength))
+                n[1]['mask_strength'] = strength
                 n[1]['set_area_to_bounds'] = False
+                if levels is not None:
+                    n[1]['mask_pyramid'] = levels
 
                 # Create attention mask for precise regional control
-                # This FORCES the model to generate content in the correct region
+                # This FORCES the model to generate content in the correct region:
+                # text-to-text always enabled, text<->image and image->image ONLY
+                # for this region's pixels, everything else blocked (-10000)
                 cond_tensor = t[0]  # [batch, seq_len, hidden_dim]
                 txt_tokens = cond_tensor.shape[1]
-                img_tokens = latent_height * latent_width
-                total_tokens = txt_tokens + img_tokens
-
-                # Initialize blocking all (-10000), then enable specific paths
-                attention_mask = torch.full((1, total_tokens, total_tokens), -10000.0, dtype=torch.float32)
-
-                # Enable text-to-text attention (prompts can interact)
-                attention_mask[0, :txt_tokens, :txt_tokens] = 0.0
-
-                # VECTORIZED: Enable text→image and image→text ONLY for this region's pixels
-                # This prevents "bird" text from affecting car region pixels
-                # Performance: ~1000x faster than nested loops for large regions
-                y_coords = torch.arange(y_latent, y_end, dtype=torch.long)
-                x_coords = torch.arange(x_latent, x_end, dtype=torch.long)
-                y_grid, x_grid = torch.meshgrid(y_coords, x_coords, indexing='ij')
-                img_token_indices = txt_tokens + (y_grid.flatten() * latent_width + x_grid.flatten())
-
-                # Enable txt→img (text can influence these image pixels)
-                attention_mask[0, :txt_tokens, img_token_indices] = 0.0
-                # Enable img→txt (these image pixels can attend to text)
-                attention_mask[0, img_token_indices, :txt_tokens] = 0.0
-
-                # VECTORIZED: Enable image→image ONLY within this region
-                # Uses broadcasting to create [N, N] assignment efficiently
-                img_idx_row = img_token_indices.unsqueeze(1)  # [N, 1]
-                img_idx_col = img_token_indices.unsqueeze(0)  # [1, N]
-                attention_mask[0, img_idx_row, img_idx_col] = 0.0  # Broadcasting creates [N, N]
+
+                # Compact block form - only expanded for the tiles the sampler reads,
+                # on the sampler's device (a dense mask is ~1 GB per region at 1344x768)
+                attention_mask = RegionAttentionMask(
+                    txt_tokens, (latent_height, latent_width), attention_boxes,
+                    dtype=memory_plan.attention_dtype,
+                )
+                if dense_attention_mask:
+                    attention_mask = attention_mask.to_dense()
 
                 n[1]['attention_mask'] = attention_mask
                 n[1]['attention_mask_img_shape'] = (latent_height, latent_width)
 
-                combined_conditioning.append(n)
+                results[layout_index].append(n)
 
-        print(f"   ✅ Generated {len(combined_conditioning)} conditioning blocks\n")
+        return results
 
-        return (combined_conditioning,)
+    @staticmethod
+    def _region_geometry(box_rows, box_canvases, output_size, soften_masks, feather_width):
+        """
+        Box resolution and feather sizes for every region.
+
+        Returns (pixel_boxes, latent_boxes, latent_extent, keep, feather_sizes),
+        the last two covering only the kept regions.
+        """
+        # All boxes at once: skip fullscreen (already added as background), scale
+        # canvas -> output, clip to bounds, convert to latent space
+        pixel_boxes, latent_boxes, latent_extent, keep = resolve_latent_boxes(
+            box_rows, box_canvases, output_size
+        )
+        if soften_masks:
+            feather_sizes = feather_sizes_for(latent_extent[keep], feather_width)
+        else:
+            feather_sizes = torch.zeros(int(keep.sum()), dtype=torch.int64)
+        return pixel_boxes, latent_boxes, latent_extent, keep, feather_sizes
+
+
+class EasyRegionMaskDynamic(EasyRegionMask):
+    """
+    Mask-based regional prompting with any number of regions.
+
+    One prompt per line instead of fixed region1-4 inputs - line N uses box N
+    on the canvas. Same conditioning as EasyRegionMask.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        base = super().INPUT_TYPES()
+        optional = base["optional"]
+        return {
+            "required": {
+                "clip": base["required"]["clip"],
+                "width": base["required"]["width"],
+                "height": base["required"]["height"],
+                "soften_masks": base["required"]["soften_masks"],
+                "background_prompt": base["required"]["background_prompt"],
+                "region_prompts": ("STRING", {
+                    "default": "red sports car\ncloseup full body giraffe wearing sunglasses\nblue bird flying",
+                    "multiline": True,
+                    "tooltip": "One region prompt per line - line 1 = Region 1, line 2 = Region 2, ... Blank lines leave that region empty (its box stays as a placeholder, so later lines keep theirs)"
+                }),
+            },
+            "optional": {
+                "background_strength": optional["background_strength"],
+                "region_strengths": ("STRING", {
+                    "default": "0.7, 0.8, 1.5",
+                    "tooltip": "Comma-separated strength per region, in order (0.0-10.0). The last value repeats for any remaining regions"
+                }),
+                "dense_attention_mask": optional["dense_attention_mask"],
+                "background_mode": optional["background_mode"],
+                "feather_width": optional["feather_width"],
+                "feather_falloff": optional["feather_falloff"],
+                "merge_duplicate_regions": optional["merge_duplicate_regions"],
+                "mask_pyramid": optional["mask_pyramid"],
+            },
+            "hidden": base["hidden"],
+        }
+
+    FUNCTION = "encode_regions_dynamic"
+    DESCRIPTION = """Mask-based regional prompting with any number of regions.
+
+Quick Start:
+1. Connect CLIP from checkpoint
+2. Set width/height to match your latent exactly
+3. Type the background prompt, then one region prompt per line
+4. Set region_strengths (comma-separated, one per line)
+5. Draw/adjust boxes on canvas
+
+Most models work best with 3-4 regions; product grids and comic panels can use more."""
+
+    def encode_regions_dynamic(self, clip, width, height, soften_masks, background_prompt, region_prompts,
+                               extra_pnginfo, unique_id, region_boxes="", background_strength=1.0,
+                               region_strengths="0.7, 0.8, 1.5", dense_attention_mask=False,
+                               background_mode="text", feather_width=6, feather_falloff="linear",
+                               merge_duplicate_regions=True, mask_pyramid=False):
+        """Encode one prompt per line and apply mask-based regional conditioning."""
+
+        values, canvas_width, canvas_height = self.resolve_boxes(region_boxes, extra_pnginfo, unique_id, width, height)
+
+        prompts = region_prompts.splitlines() if region_prompts else []
+
+        strengths, invalid = parse_strengths(region_strengths, len(prompts))
+        for part in invalid:
+            logger.warning("⚠️  Ignoring invalid region strength '%s'", part)
+
+        return self.encode_mask_regions(
+            clip, width, height, values, canvas_width, canvas_height,
+            background_prompt, background_strength, prompts, strengths,
+            soften_masks, feather_width, feather_falloff, background_mode, dense_attention_mask,
+            merge_duplicate_regions, mask_pyramid,
+        )
+
+
+class EasyRegionMaskBatch(EasyRegionMask):
+    """
+    Mask-based regional prompting for many layouts in one call.
+
+    Takes a JSON list of layouts (boxes + prompts) and outputs one conditioning
+    per layout. Prompts shared between layouts are encoded once and all masks
+    are built in a single batched pass, so cost grows with unique prompts
+    rather than with the number of layouts.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        base = super().INPUT_TYPES()
+        optional = base["optional"]
+        return {
+            "required": {
+                "clip": base["required"]["clip"],
+                "width": base["required"]["width"],
+                "height": base["required"]["height"],
+                "soften_masks": base["required"]["soften_masks"],
+                "background_prompt": base["required"]["background_prompt"],
+                "layouts": ("STRING", {
+                    "default": '[{"boxes": [[0, 320, 368, 462], [448, 64, 384, 704]], '
+                               '"prompts": ["red sports car", "giraffe wearing sunglasses"], "strengths": [0.7, 0.8]}]',
+                    "multiline": True,
+                    "tooltip": "JSON list of layouts (or one JSON object per line). Each: {\"boxes\": [[x, y, w, h], ...], \"prompts\": [...], \"strengths\": [...]}, optional canvas_width/canvas_height (default width/height) and background_prompt"
+                }),
+            },
+            "optional": {
+                "background_strength": optional["background_strength"],
+                "dense_attention_mask": optional["dense_attention_mask"],
+                "background_mode": optional["background_mode"],
+                "feather_width": optional["feather_width"],
+                "feather_falloff": optional["feather_falloff"],
+                "merge_duplicate_regions": optional["merge_duplicate_regions"],
+                "mask_pyramid": optional["mask_pyramid"],
+            },
+        }
+
+    OUTPUT_IS_LIST = (True,)
+    FUNCTION = "encode_regions_batch"
+    DESCRIPTION = """Mask-based regional prompting for a batch of layouts (A/B sweeps).
+
+Outputs a list with one conditioning per layout - downstream nodes run once per
+entry. Prompts shared between layouts are encoded once."""
+
+    def encode_regions_batch(self, clip, width, height, soften_masks, background_prompt, layouts,
+                             background_strength=1.0, dense_attention_mask=False, background_mode="text",
+                             feather_width=6, feather_falloff="linear", merge_duplicate_regions=True,
+                             mask_pyramid=False):
+        """Encode every layout, sharing prompt encodings and one batched mask build."""
+
+        parsed = parse_layouts(layouts, width, height)
+        if not parsed:
+            raise ValueError("EasyRegion batch: no layouts given")
+        for layout in parsed:
+            if layout["background_prompt"] is None:
+                layout["background_prompt"] = background_prompt
+
+        result_key = content_hash(
+            type(self).__name__, parsed, width, height, clip_identity(clip), background_strength,
+            soften_masks, feather_width, feather_falloff, background_mode, dense_attention_mask,
+            merge_duplicate_regions, mask_pyramid,
+        )
+        cached = cached_result(result_key)
+        if cached is not None:
+            return cached
+
+        num_prompts = len({p for layout in parsed for p in [layout["background_prompt"]] + layout["region_prompts"]
+                           if p and p.strip()})
+        logger.info(
+            "🎨 EasyRegion batch: %dx%d (latent %dx%d), %d layouts, %d unique prompts, "
+            "soften %s (width %d, %s), background mode %s",
+            width, height, width // 8, height // 8, len(parsed), num_prompts,
+            "on" if soften_masks else "off", feather_width, feather_falloff, background_mode,
+        )
+
+        with span("node", node=type(self).__name__, layouts=len(parsed)) as node_span:
+            conditionings = self.build_layout_conditionings(
+                clip, width, height, parsed, background_strength, soften_masks,
+                feather_width, feather_falloff, background_mode, dense_attention_mask, merge_duplicate_regions,
+                mask_pyramid,
+            )
+            node_span.add_bytes(conditionings)
+
+        logger.info("✅ EasyRegion: %d conditioning blocks for %d layouts in %.1f ms",
+                    sum(len(c) for c in conditionings), len(conditionings), node_span.seconds * 1000)
+
+        result = (conditionings,)
+        if not dense_attention_mask:
+            RESULT_CACHE.put(result_key, result)
+        return result
+
+
+class EasyRegionMaskTiled(EasyRegionMask):
+    """
+    Mask-based regional prompting split into overlapping tiles.
+
+    Same inputs as EasyRegionMask plus a tile size and overlap. Outputs one
+    conditioning per tile, carrying only the regions that reach into that tile,
+    with masks and attention masks at tile size - for tiled samplers and
+    resolutions where full-image masks would not fit.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        base = super().INPUT_TYPES()
+        optional = dict(base["optional"])
+        # Tiles build their masks on demand; full-image dense tensors defeat the point
+        optional.pop("dense_attention_mask")
+        optional["tile_size"] = ("INT", {
+            "default": 1024,
+            "min": 64,
+            "max": MAX_RESOLUTION,
+            "step": 64,
+            "tooltip": "Tile width and height in pixels - match your tiled sampler"
+        })
+        optional["tile_overlap"] = ("INT", {
+            "default": 128,
+            "min": 0,
+            "max": MAX_RESOLUTION,
+            "step": 8,
+            "tooltip": "Overlap between neighbouring tiles in pixels"
+        })
+        return {"required": base["required"], "optional": optional, "hidden": base["hidden"]}
+
+    RETURN_TYPES = ("CONDITIONING", "STRING")
+    RETURN_NAMES = ("conditioning", "tiles")
+    OUTPUT_IS_LIST = (True, True)
+    FUNCTION = "encode_regions_tiled"
+    DESCRIPTION = """Mask-based regional prompting for tiled sampling.
+
+Outputs a list with one conditioning per tile, and each tile's position as
+JSON [x, y, width, height] in pixels. Each tile only carries the regions
+that overlap it, with tile-sized masks."""
+
+    def encode_regions_tiled(self, clip, width, height, background_strength, soften_masks, background_prompt,
+                             region1_prompt, extra_pnginfo, unique_id, region_boxes="",
+                             region1_strength=0.7, region2_prompt="", region2_strength=0.8,
+                             region3_prompt="", region3_strength=1.5, region4_prompt="", region4_strength=2.5,
+                             background_mode="text", feather_width=6, feather_falloff="linear",
+                             merge_duplicate_regions=True, mask_pyramid=False, tile_size=1024, tile_overlap=128):
+        """Encode the regions once, then crop the (deferred) masks to each tile."""
+
+        if tile_overlap >= tile_size:
+            raise ValueError(f"EasyRegion tiled: tile_overlap ({tile_overlap}) must be smaller than tile_size ({tile_size})")
+
+        # Full-image masks stay as geometry - only the tile crops are ever built
+        (conditioning,) = self.encode_regions_mask(
+            clip, width, height, background_strength, soften_masks, background_prompt, region1_prompt,
+            extra_pnginfo, unique_id, region_boxes, region1_strength, region2_prompt, region2_strength,
+            region3_prompt, region3_strength, region4_prompt, region4_strength,
+            False, background_mode, feather_width, feather_falloff, merge_duplicate_regions, False,
+        )
+
+        tiles = tile_grid((height // 8, width // 8), tile_size // 8, tile_overlap // 8)
+        conditionings = []
+        positions = []
+        with span("tiles", tiles=len(tiles)):
+            for tile in tiles:
+                conditionings.append(tile_conditioning(conditioning, tile, mask_pyramid))
+                y_start, y_end, x_start, x_end = tile
+                positions.append(json.dumps([x_start * 8, y_start * 8, (x_end - x_start) * 8, (y_end - y_start) * 8]))
+        regions_per_tile = [sum(1 for _, options in c if "mask" in options) for c in conditionings]
+        logger.info("EasyRegion: %d tiles of %dx%d, %d-%d region blocks per tile", len(tiles), tile_size, tile_size,
+                    min(regions_per_tile), max(regions_per_tile))
+
+        return (conditionings, positions)
+
+
+class EasyRegionMaskMultiRes(EasyRegionMask):
+    """
+    Mask-based regional prompting at several output resolutions at once.
+
+    Same inputs as EasyRegionMask plus a list of extra resolutions (e.g. the
+    hires-fix pass). Every prompt is encoded once for all of them; boxes are
+    rescaled from the canvas to each resolution like the single-size node does.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        base = super().INPUT_TYPES()
+        optional = dict(base["optional"])
+        optional["resolutions"] = ("STRING", {
+            "default": "2016x1152",
+            "tooltip": "Extra output resolutions as WIDTHxHEIGHT, comma-separated (e.g. your hires-fix size). One conditioning per entry on the second output"
+        })
+        return {"required": base["required"], "optional": optional, "hidden": base["hidden"]}
+
+    RETURN_TYPES = ("CONDITIONING", "CONDITIONING")
+    RETURN_NAMES = ("conditioning", "resolution_conditionings")
+    OUTPUT_IS_LIST = (False, True)
+    FUNCTION = "encode_regions_multires"
+    DESCRIPTION = """Mask-based regional prompting for multi-pass (hires-fix) workflows.
+
+First output: conditioning at width x height, for the first pass.
+Second output: one conditioning per entry of resolutions, in order - with a
+single entry it connects straight to the hires sampler. Prompts are encoded once
+for all resolutions."""
+
+    def encode_regions_multires(self, clip, width, height, background_strength, soften_masks, background_prompt,
+                                region1_prompt, extra_pnginfo, unique_id, region_boxes="",
+                                region1_strength=0.7, region2_prompt="", region2_strength=0.8,
+                                region3_prompt="", region3_strength=1.5, region4_prompt="", region4_strength=2.5,
+                                dense_attention_mask=False, background_mode="text", feather_width=6,
+                                feather_falloff="linear", merge_duplicate_regions=True, mask_pyramid=False,
+                                resolutions="2016x1152"):
+        """Encode the prompts once and build masks for width x height and every extra resolution."""
+
+        sizes, invalid = parse_resolutions(resolutions)
+        for part in invalid:
+            logger.warning("⚠️  Ignoring invalid resolution '%s' (expected WIDTHxHEIGHT)", part)
+
+        values, canvas_width, canvas_height = self.resolve_boxes(region_boxes, extra_pnginfo, unique_id, width, height)
+
+        # Share one set of encodings between all resolutions, even with the
+        # global encoding cache turned off
+        encode_cache = ENCODE_CACHE if ENCODE_CACHE.max_entries > 0 else PromptEncodingCache(max_bytes=float("inf"))
+
+        conditionings = []
+        for output_width, output_height in [(width, height)] + sizes:
+            (conditioning,) = self.encode_mask_regions(
+                clip, output_width, output_height, values, canvas_width, canvas_height,
+                background_prompt, background_strength,
+                [region1_prompt, region2_prompt, region3_prompt, region4_prompt],
+                [region1_strength, region2_strength, region3_strength, region4_strength],
+                soften_masks, feather_width, feather_falloff, background_mode, dense_attention_mask,
+                merge_duplicate_regions, mask_pyramid, encode_cache,
+            )
+            conditionings.append(conditioning)
+
+        return (conditionings[0], conditionings[1:])
 
 
 # Note: These enhanced nodes need the same JavaScript UI as the original nodes
@@ -3,21 +3,50 @@
 
 from .RegionalPrompting import (
     EasyRegionSimple,
-    EasyRegionMask
+    EasyRegionMask,
+    EasyRegionMaskDynamic,
+    EasyRegionMaskBatch,
+    EasyRegionMaskTiled,
+    EasyRegionMaskMultiRes
 )
 
 NODE_CLASS_MAPPINGS = {
     "EasyRegionSimple": EasyRegionSimple,
     "EasyRegionMask": EasyRegionMask,
+    "EasyRegionMaskDynamic": EasyRegionMaskDynamic,
+    "EasyRegionMaskBatch": EasyRegionMaskBatch,
+    "EasyRegionMaskTiled": EasyRegionMaskTiled,
+    "EasyRegionMaskMultiRes": EasyRegionMaskMultiRes,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "EasyRegionSimple": "EasyRegion (Area-Based)",
     "EasyRegionMask": "EasyRegion (Mask-Based)",
+    "EasyRegionMaskDynamic": "EasyRegion (Mask-Based, Dynamic)",
+    "EasyRegionMaskBatch": "EasyRegion (Mask-Based, Batch)",
+    "EasyRegionMaskTiled": "EasyRegion (Mask-Based, Tiled)",
+    "EasyRegionMaskMultiRes": "EasyRegion (Mask-Based, Multi-Resolution)",
 }
 
-# Export web directory for JavaScript files
+# Aggregated timing/cache stats for scraping: GET /easyregion/stats (?reset=1 clears the timings)
+# Set EASYREGION_STATS_ROUTE=0 to leave the route out
 import os
+if os.environ.get("EASYREGION_STATS_ROUTE", "1") != "0":
+    try:
+        from aiohttp import web
+        from server import PromptServer
+        from .easyregion.instrumentation import STATS
+
+        @PromptServer.instance.routes.get("/easyregion/stats")
+        async def easyregion_stats(request):
+            snapshot = STATS.snapshot()
+            if request.query.get("reset") in ("1", "true"):
+                STATS.reset()
+            return web.json_response(snapshot)
+    except Exception:
+        pass  # Not running inside the ComfyUI server
+
+# Export web directory for JavaScript files
 WEB_DIRECTORY = os.path.join(os.path.dirname(__file__), "js")
 
 __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS', 'WEB_DIRECTORY']
@@ -0,0 +1,58 @@
+# Time the precomputed mask pyramid (mask_pyramid input)
+# Compares per-step resize cost against a level lookup. That the levels equal
+# on-the-fly interpolation is covered by tests/test_masks.py.
+# Usage: python benchmarks/mask_pyramid.py [--width 1344] [--height 768] [--steps 30]
+
+import argparse
+import importlib
+import time
+
+import torch
+
+from stubs import PACKAGE_NAME, StubCLIP, load_easyregion
+
+
+def on_the_fly(mask, size):
+    """What a sampler-side attention patch does each step without the pyramid."""
+    return torch.nn.functional.interpolate(mask.unsqueeze(1), size=size, mode="bilinear",
+                                           align_corners=False).squeeze(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the EasyRegion mask pyramid")
+    parser.add_argument("--width", type=int, default=1344)
+    parser.add_argument("--height", type=int, default=768)
+    parser.add_argument("--steps", type=int, default=30)
+    args = parser.parse_args()
+
+    rp = load_easyregion()
+    masks = importlib.import_module(f"{PACKAGE_NAME}.easyregion.masks")
+    node = rp.EasyRegionMaskDynamic()
+
+    (conditioning,) = node.encode_regions_dynamic(
+        StubCLIP(), args.width, args.height, True, "city street at night",
+        "red sports car\ngiraffe wearing sunglasses\nblue bird flying\nred sports car",
+        None, "0", region_boxes="[[0, 320, 368, 462], [448, 64, 384, 704], [945, 0, 378, 256], [40, 20, 200, 200]]",
+        mask_pyramid=True,
+    )
+
+    # Per-step cost: resize every step vs looking the level up
+    options = conditioning[1][1]
+    mask = options["mask"].to("cpu")
+    sizes = list(options["mask_pyramid"])
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        for size in sizes:
+            on_the_fly(mask, size)
+    resize_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        for size in sizes:
+            masks.mask_for_size(options, size).to("cpu")
+    lookup_seconds = time.perf_counter() - start
+    print(f"{args.steps} steps x {len(sizes)} levels: resize {resize_seconds * 1000:.2f} ms, "
+          f"pyramid lookup {lookup_seconds * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
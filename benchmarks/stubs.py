@@ -0,0 +1,78 @@
+# Shared helpers for the EasyRegion benchmarks
+# Loads the node package outside ComfyUI and provides a deterministic CPU CLIP stand-in
+
+import importlib
+import importlib.util
+import sys
+import time
+import types
+import zlib
+from pathlib import Path
+
+import torch
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PACKAGE_NAME = "ComfyUI_EasyRegion"
+
+
+def load_easyregion():
+    """Import RegionalPrompting with minimal nodes/folder_paths shims (no ComfyUI install needed)."""
+    if "nodes" not in sys.modules:
+        nodes = types.ModuleType("nodes")
+        nodes.MAX_RESOLUTION = 16384
+        sys.modules["nodes"] = nodes
+    if "folder_paths" not in sys.modules:
+        sys.modules["folder_paths"] = types.ModuleType("folder_paths")
+
+    if PACKAGE_NAME not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            PACKAGE_NAME, REPO_ROOT / "__init__.py", submodule_search_locations=[str(REPO_ROOT)]
+        )
+        package = importlib.util.module_from_spec(spec)
+        sys.modules[PACKAGE_NAME] = package
+        spec.loader.exec_module(package)
+    return importlib.import_module(f"{PACKAGE_NAME}.RegionalPrompting")
+
+
+class StubCLIP:
+    """
+    Deterministic CLIP stand-in with ComfyUI's tokenize/encode_from_tokens interface.
+
+    Tokens are padded to 77-token chunks like CLIP-L, and encoding cost scales
+    with the number of chunks (two dense layers per token), so timings track
+    prompt length the way a real text encoder does.
+    """
+
+    CHUNK = 77
+    VOCAB = 4096
+
+    def __init__(self, hidden_dim=768, seed=0):
+        generator = torch.Generator().manual_seed(seed)
+        self.embedding = torch.randn(self.VOCAB, hidden_dim, generator=generator)
+        self.w1 = torch.randn(hidden_dim, hidden_dim * 2, generator=generator) / hidden_dim ** 0.5
+        self.w2 = torch.randn(hidden_dim * 2, hidden_dim, generator=generator) / (hidden_dim * 2) ** 0.5
+        self.encode_calls = 0
+        self.encoded_chunks = 0
+        self.encode_seconds = 0.0
+
+    def tokenize(self, text):
+        ids = [zlib.crc32(word.encode("utf-8")) % (self.VOCAB - 2) + 2 for word in text.replace(",", " , ").split()]
+        body = self.CHUNK - 2
+        chunks = []
+        for start in range(0, max(len(ids), 1), body):
+            chunk = [0] + ids[start:start + body] + [1]
+            chunk += [1] * (self.CHUNK - len(chunk))
+            chunks.append([(token, 1.0) for token in chunk])
+        return {"l": chunks}
+
+    def encode_from_tokens(self, tokens, return_pooled=False):
+        start = time.perf_counter()
+        ids = torch.tensor([[token for token, _ in chunk] for chunk in tokens["l"]])
+        hidden = torch.tanh(self.embedding[ids] @ self.w1) @ self.w2
+        cond = hidden.reshape(1, -1, hidden.shape[-1])
+        self.encode_calls += 1
+        self.encoded_chunks += ids.shape[0]
+        self.encode_seconds += time.perf_counter() - start
+        if return_pooled:
+            return cond, hidden[0:1, -1]
+        return cond
@@ -0,0 +1,326 @@
+# EasyRegion benchmark suite
+# Sweeps resolution, region count, soften_masks and prompt length over both node
+# types with a CPU stand-in CLIP, and records wall time, peak RSS and tensor
+# bytes per stage as JSON.
+#
+# Usage:
+#   python benchmarks/suite.py --output results.json
+#   python benchmarks/suite.py --quick
+#   python benchmarks/suite.py --compare before.json --output after.json
+
+import argparse
+import contextlib
+import datetime
+import gc
+import importlib
+import io
+import itertools
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+
+import torch
+
+from stubs import PACKAGE_NAME, REPO_ROOT, StubCLIP, load_easyregion
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RESOLUTIONS = (512, 1024, 1536, 2048)
+REGION_COUNTS = (1, 2, 4, 8)
+PROMPT_WORDS = (8, 120)  # one CLIP chunk vs two
+QUICK = {"resolutions": (512, 1024), "regions": (1, 4), "prompt_words": (8,)}
+
+
+def peak_rss_mb():
+    """Process high-water RSS in MB (None where the resource module is missing)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def tensor_bytes(value):
+    """Bytes held by the tensors in (nested) conditioning structures."""
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (list, tuple)):
+        return sum(tensor_bytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(tensor_bytes(v) for v in value.values())
+    return 0
+
+
+def grid_boxes(count, size):
+    """Deterministic non-overlapping [x, y, w, h] boxes tiling a size x size canvas."""
+    cols = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / cols)
+    cell_w, cell_h = size // cols, size // rows
+    margin = 16
+    return [[c * cell_w + margin, r * cell_h + margin, cell_w - 2 * margin, cell_h - 2 * margin]
+            for r in range(rows) for c in range(cols)][:count]
+
+
+def prompt_of(words, seed):
+    return " ".join(f"w{seed}_{i}" for i in range(words))
+
+
+class Modules:
+    """The package modules a case touches, loaded once per process."""
+
+    def __init__(self):
+        self.rp = load_easyregion()
+        self.encoding = importlib.import_module(f"{PACKAGE_NAME}.easyregion.encoding")
+        self.masks = importlib.import_module(f"{PACKAGE_NAME}.easyregion.masks")
+        self.attention = importlib.import_module(f"{PACKAGE_NAME}.easyregion.attention")
+        self.results = importlib.import_module(f"{PACKAGE_NAME}.easyregion.results")
+
+    def clear_caches(self):
+        self.encoding.ENCODE_CACHE.clear()
+        self.results.RESULT_CACHE.clear()
+        self.masks.clear_mask_cache()
+        gc.collect()
+
+
+def timed(repeat, fn, before=None):
+    """Best wall time over repeat runs; returns (seconds, last result)."""
+    best, result = None, None
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def stage(name, seconds, nbytes, **extra):
+    return dict(stage=name, seconds=round(seconds, 6), tensor_bytes=int(nbytes), peak_rss_mb=peak_rss_mb(), **extra)
+
+
+def run_mask_case(m, case, repeat, max_dense_mb):
+    size, count, soften, words = case["resolution"], case["regions"], case["soften_masks"], case["prompt_words"]
+    background = prompt_of(words, 0)
+    prompts = [prompt_of(words, i + 1) for i in range(count)]
+    strengths = [1.0] * count
+    boxes = grid_boxes(count, size)
+    stages = []
+
+    # Box resolution (canvas == output here, so no rescale)
+    seconds, resolved = timed(repeat, lambda: m.masks.resolve_latent_boxes(boxes, (size, size), (size, size)))
+    _, latent_boxes, latent_extent, keep = resolved
+    stages.append(stage("resolve", seconds, sum(tensor_bytes(t) for t in resolved)))
+
+    # Text encoding, cold cache, "text" background mode (background + region per prompt)
+    clip = StubCLIP()
+    combined = [background] + [f"{background}, {p}" for p in prompts]
+    seconds, encoded = timed(repeat, lambda: m.encoding.encode_prompts(clip, combined),
+                             before=m.encoding.ENCODE_CACHE.clear)
+    stages.append(stage("encode", seconds, tensor_bytes(encoded)))
+
+    # Region masks, built as the sampler would (materialized on the CPU)
+    latent_shape = (size // 8, size // 8)
+    feather = m.masks.feather_sizes_for(latent_extent[keep], 6) if soften else 0
+    seconds, stack = timed(
+        repeat,
+        lambda: m.masks.RegionMaskStack(latent_boxes[keep], latent_shape, feather, "linear").materialize(),
+        before=m.masks.clear_mask_cache,
+    )
+    stages.append(stage("masks", seconds, tensor_bytes(stack)))
+
+    # Dense attention masks - what a sampler expanding the full mask pays
+    txt_tokens = encoded[1][0].shape[1]
+    dense_bytes = count * (txt_tokens + latent_shape[0] * latent_shape[1]) ** 2 * 4
+    if dense_bytes <= max_dense_mb * 1024 * 1024:
+        def build_attention():
+            return [m.attention.RegionAttentionMask(txt_tokens, latent_shape, tuple(b)).materialize()
+                    for b in latent_boxes[keep].tolist()]
+        seconds, dense = timed(repeat, build_attention)
+        stages.append(stage("attention", seconds, tensor_bytes(dense)))
+        del dense
+    else:
+        stages.append(stage("attention", 0.0, dense_bytes, skipped=f"over --max-dense-mb {max_dense_mb}"))
+
+    # Whole node, cold caches, including the sampler-side mask materialization
+    node = m.rp.EasyRegionMaskDynamic()
+
+    def run_node():
+        (conditioning,) = node.encode_mask_regions(
+            StubCLIP(), size, size, boxes, size, size, background, 1.0, prompts, strengths,
+            soften, 6, "linear", "text", False,
+        )
+        for _, options in conditioning:
+            if "mask" in options:
+                options["mask"] = options["mask"].to("cpu")
+        return conditioning
+
+    seconds, conditioning = timed(repeat, run_node, before=m.clear_caches)
+    stages.append(stage("node", seconds, tensor_bytes([[c[0], c[1].get("mask")] for c in conditioning])))
+    return stages
+
+
+def run_area_case(m, case, repeat):
+    size, count, words = case["resolution"], case["regions"], case["prompt_words"]
+    prompts = [prompt_of(words, i + 1) for i in range(count)] + [""] * (4 - count)
+    boxes = [box + [1.0] for box in grid_boxes(count, size)]
+    workflow = {"workflow": {"nodes": [{"id": 1, "properties": {"values": boxes, "width": size, "height": size}}]}}
+    node = m.rp.EasyRegionSimple()
+
+    def run_node():
+        (conditioning,) = node.encode_regions(
+            StubCLIP(), prompt_of(words, 0), prompts[0], workflow, "1",
+            region2_prompt=prompts[1], region3_prompt=prompts[2], region4_prompt=prompts[3],
+        )
+        return conditioning
+
+    seconds, conditioning = timed(repeat, run_node, before=m.clear_caches)
+    return [stage("node", seconds, tensor_bytes([c[0] for c in conditioning]))]
+
+
+def run_case(case, repeat, max_dense_mb, modules=None):
+    m = modules or Modules()
+    baseline = peak_rss_mb()
+    # The nodes' console summaries would drown the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        if case["node"] == "mask":
+            stages = run_mask_case(m, case, repeat, max_dense_mb)
+        else:
+            stages = run_area_case(m, case, repeat)
+    return dict(case, baseline_rss_mb=baseline, stages=stages)
+
+
+def build_cases(args):
+    cases = []
+    for node in args.nodes:
+        for size, count, soften, words in itertools.product(
+            args.resolutions, args.regions, (True, False), args.prompt_words
+        ):
+            if node == "area":
+                # Area conditioning has four region slots and no masks to soften
+                if count > 4 or not soften:
+                    continue
+            cases.append(dict(node=node, resolution=size, regions=count, soften_masks=soften, prompt_words=words))
+    return cases
+
+
+def run_isolated(case, args):
+    """Run one case in a fresh interpreter so peak RSS belongs to that case alone."""
+    command = [sys.executable, __file__, "--case", json.dumps(case),
+               "--repeat", str(args.repeat), "--max-dense-mb", str(args.max_dense_mb)]
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=REPO_ROOT / "benchmarks")
+    if completed.returncode != 0:
+        return dict(case, error=completed.stderr.strip().splitlines()[-1:] or ["failed"])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=REPO_ROOT, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_id(case):
+    return (case["node"], case["resolution"], case["regions"], case["soften_masks"], case["prompt_words"])
+
+
+def print_table(results, baseline=None):
+    previous = {}
+    if baseline:
+        for case in baseline["cases"]:
+            for s in case.get("stages", []):
+                previous[case_id(case) + (s["stage"],)] = s["seconds"]
+
+    header = f"{'node':<6}{'res':>6}{'regions':>8}{'soften':>8}{'words':>7}  {'stage':<10}{'seconds':>10}{'MB':>10}{'RSS MB':>9}"
+    if previous:
+        header += f"{'vs base':>9}"
+    print(header)
+    for case in results:
+        if "error" in case:
+            print(f"{case['node']:<6}{case['resolution']:>6}{case['regions']:>8}  error: {case['error']}")
+            continue
+        for s in case["stages"]:
+            line = (f"{case['node']:<6}{case['resolution']:>6}{case['regions']:>8}{str(case['soften_masks']):>8}"
+                    f"{case['prompt_words']:>7}  {s['stage']:<10}")
+            if s.get("skipped") is not None:
+                # Not run - zero time and no memory reading, not a fast stage
+                print(line + f"{'skipped':>10}{'-':>10}{'-':>9}  ({s['skipped']})")
+                continue
+            rss = f"{s['peak_rss_mb']:.0f}" if s["peak_rss_mb"] is not None else "-"
+            line += f"{s['seconds']:>10.4f}{s['tensor_bytes'] / 2 ** 20:>10.1f}{rss:>9}"
+            before = previous.get(case_id(case) + (s["stage"],))
+            if before:
+                line += f"{s['seconds'] / before:>8.2f}x"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the EasyRegion nodes on CPU")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="previous results JSON to compare stage times against")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage (best time is kept)")
+    parser.add_argument("--nodes", nargs="+", choices=("mask", "area"), default=["mask", "area"])
+    parser.add_argument("--resolutions", nargs="+", type=int, default=list(RESOLUTIONS))
+    parser.add_argument("--regions", nargs="+", type=int, default=list(REGION_COUNTS))
+    parser.add_argument("--prompt-words", nargs="+", type=int, default=list(PROMPT_WORDS))
+    parser.add_argument("--max-dense-mb", type=int, default=1024,
+                        help="skip dense attention expansion above this size")
+    parser.add_argument("--quick", action="store_true", help="small sweep for a fast sanity check")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="run all cases in this process (faster, but peak RSS accumulates)")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        # Child process of run_isolated
+        print(json.dumps(run_case(json.loads(args.case), args.repeat, args.max_dense_mb)))
+        return
+
+    if args.quick:
+        args.resolutions, args.regions, args.prompt_words = QUICK["resolutions"], QUICK["regions"], QUICK["prompt_words"]
+
+    cases = build_cases(args)
+    modules = Modules() if args.no_isolate else None
+    results = []
+    for number, case in enumerate(cases, 1):
+        print(f"[{number}/{len(cases)}] {case}", file=sys.stderr)
+        if modules is not None:
+            results.append(run_case(case, args.repeat, args.max_dense_mb, modules))
+        else:
+            results.append(run_isolated(case, args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    if args.output:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "torch": torch.__version__,
+                "platform": platform.platform(),
+                "threads": torch.get_num_threads(),
+                "repeat": args.repeat,
+                "isolated": not args.no_isolate,
+            },
+            "cases": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {len(results)} cases to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Size the tiled conditioning (EasyRegion (Mask-Based, Tiled))
+# Compares the largest tile's mask and attention-mask bytes against the full
+# image. tests/test_tiling.py checks the tile masks themselves.
+# Usage: python benchmarks/tiled.py [--width 4096] [--height 4096] [--tile-size 1024] [--tile-overlap 128]
+
+import argparse
+
+from stubs import StubCLIP, load_easyregion
+
+PROMPTS = ["red sports car", "giraffe wearing sunglasses", "blue bird flying", "red sports car"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Size EasyRegion tiled conditioning")
+    parser.add_argument("--width", type=int, default=4096)
+    parser.add_argument("--height", type=int, default=4096)
+    parser.add_argument("--tile-size", type=int, default=1024)
+    parser.add_argument("--tile-overlap", type=int, default=128)
+    args = parser.parse_args()
+
+    rp = load_easyregion()
+    w, h = args.width, args.height
+    boxes = [[0, h // 2, w // 3, h // 3], [w // 3, h // 8, w // 3, h * 3 // 4],
+             [w * 2 // 3, 0, w // 3, h // 5], [w // 20, h // 20, w // 6, h // 6]]
+    region_inputs = {}
+    for i, prompt in enumerate(PROMPTS, 1):
+        region_inputs[f"region{i}_prompt"] = prompt
+
+    clip = StubCLIP()
+    (full,) = rp.EasyRegionMask().encode_regions_mask(
+        clip, w, h, 1.0, True, "city street at night", extra_pnginfo=None, unique_id="0",
+        region_boxes=str(boxes), **region_inputs,
+    )
+    conditionings, _ = rp.EasyRegionMaskTiled().encode_regions_tiled(
+        clip, w, h, 1.0, True, "city street at night", extra_pnginfo=None, unique_id="0",
+        region_boxes=str(boxes), tile_size=args.tile_size, tile_overlap=args.tile_overlap, **region_inputs,
+    )
+
+    def dense_bytes(conditioning):
+        # What the sampler materializes: masks plus (txt+img)^2 attention masks
+        total = 0
+        for _, options in conditioning:
+            if "mask" in options:
+                total += options["mask"].numel() * options["mask"].element_size()
+                total += options["attention_mask"].numel() * options["attention_mask"].element_size()
+        return total
+
+    largest = max(dense_bytes(c) for c in conditionings)
+    print(f"{w}x{h}, {len(conditionings)} tiles of {args.tile_size}: full image {dense_bytes(full) / 2**20:.1f} MB, "
+          f"largest tile {largest / 2**20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# EasyRegion core helpers
+# Pure torch - no ComfyUI imports, so these can be used outside the node graph
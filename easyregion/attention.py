@@ -0,0 +1,115 @@
+# Block-structured attention masks for regional prompting
+# A region's (txt+img)² attention mask only has two values: 0.0 where both
+# tokens are "allowed" (text tokens, or image tokens inside the region box)
+# and -10000.0 everywhere else. We store the structure and expand it on demand.
+
+import torch
+
+from .instrumentation import span
+from .lazy import LazyTensor
+
+ATTENTION_BLOCKED = -10000.0
+
+
+class RegionAttentionMask(LazyTensor):
+    """
+    Compact attention mask for a single region.
+
+    Stores the text block size, the latent image shape and the region box
+    (or boxes - regions sharing a prompt attend to the union of their boxes)
+    instead of a dense (1, txt+img, txt+img) tensor. Expands to exactly the
+    same values the dense builder produced, but only for the slices a
+    consumer asks for (e.g. upscale_dit_mask reads the four quadrants).
+
+    Behaves enough like a tensor for ComfyUI's conditioning pipeline:
+    shape/ndim/dtype, slicing, .to(), and torch functions all expand lazily.
+    .to(device) builds the dense mask directly on that device.
+    """
+
+    # Dense forms are (txt+img)^2 - only keep them while the sampler holds them
+    weak_cache = True
+
+    def __init__(self, txt_tokens, img_shape, box, dtype=torch.float32):
+        # box is (y_start, y_end, x_start, x_end) in latent pixels, end exclusive,
+        # or a list of such boxes
+        super().__init__(dtype)
+        self.txt_tokens = int(txt_tokens)
+        self.img_shape = (int(img_shape[0]), int(img_shape[1]))
+        boxes = [box] if len(box) == 4 and not isinstance(box[0], (list, tuple)) else box
+        self.boxes = tuple(tuple(int(v) for v in b) for b in boxes)
+
+    # ---- structure -------------------------------------------------------
+
+    @property
+    def total_tokens(self):
+        return self.txt_tokens + self.img_shape[0] * self.img_shape[1]
+
+    @property
+    def shape(self):
+        return torch.Size((1, self.total_tokens, self.total_tokens))
+
+    def region_map(self, device=None):
+        """Boolean (H, W) map of latent pixels that belong to this region."""
+        latent_height, latent_width = self.img_shape
+        region = torch.zeros((latent_height, latent_width), dtype=torch.bool, device=device)
+        for y_start, y_end, x_start, x_end in self.boxes:
+            region[y_start:y_end, x_start:x_end] = True
+        return region
+
+    def allowed_tokens(self, device=None):
+        """Boolean (txt+img,) vector: text block plus this region's image tokens."""
+        allowed = torch.zeros(self.total_tokens, dtype=torch.bool, device=device)
+        allowed[:self.txt_tokens] = True
+        allowed[self.txt_tokens:] = self.region_map(device).flatten()
+        return allowed
+
+    # ---- expansion -------------------------------------------------------
+
+    def tile(self, rows=slice(None), cols=slice(None), device=None, dtype=None):
+        """
+        Expand the (rows, cols) block of the mask to a dense 2D tensor.
+
+        rows/cols accept anything that indexes a 1D tensor (slice, int, index tensor).
+        Integer indices drop that dimension, like regular tensor indexing.
+        """
+        with span("attention", device=str(device or "cpu")) as attention_span:
+            allowed = self.allowed_tokens(device)
+            row_allowed = allowed[rows]
+            col_allowed = allowed[cols]
+            row_vec = row_allowed.reshape(-1)
+            col_vec = col_allowed.reshape(-1)
+
+            block = torch.full((row_vec.shape[0], col_vec.shape[0]), ATTENTION_BLOCKED,
+                               dtype=dtype or self.dtype, device=device)
+            row_idx = row_vec.nonzero().flatten()
+            col_idx = col_vec.nonzero().flatten()
+            block[row_idx.unsqueeze(1), col_idx.unsqueeze(0)] = 0.0
+            attention_span.add_bytes(block)
+
+        if row_allowed.ndim == 0:
+            block = block[0]
+            if col_allowed.ndim == 0:
+                block = block[0]
+        elif col_allowed.ndim == 0:
+            block = block[:, 0]
+        return block
+
+    def build(self, device, dtype):
+        """Full (1, txt+img, txt+img) tensor, identical to the legacy dense mask."""
+        return self.tile(device=device, dtype=dtype).unsqueeze(0)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        # Fast path: plain slices/ints over (batch, rows, cols) only expand the requested tile.
+        # Slices are real CPU tensors - consumers such as upscale_dit_mask hand them to
+        # einops/interpolate, which need a torch.Tensor, before moving them to a device
+        if len(key) <= 3 and all(isinstance(k, (slice, int)) for k in key):
+            key = key + (slice(None),) * (3 - len(key))
+            batch_key, row_key, col_key = key
+            return self.tile(row_key, col_key).unsqueeze(0)[batch_key]
+        return self.materialize()[key]
+
+    def __repr__(self):
+        return (f"RegionAttentionMask(txt_tokens={self.txt_tokens}, img_shape={self.img_shape}, "
+                f"boxes={self.boxes}, dtype={self.dtype})")
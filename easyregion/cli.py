@@ -0,0 +1,112 @@
+# Offline mask building
+# Streams a JSONL file of layouts (one {"boxes": ..., "prompts": ...} object
+# per line, as taken by the Batch node) and writes each layout's resolved
+# boxes and region masks to its own file, across worker processes.
+# Usage: python -m easyregion.cli layouts.jsonl --width 1344 --height 768 --output masks/ [--workers 4]
+# (run from the repository root; "-" reads layouts from stdin)
+
+import argparse
+import json
+import logging
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+
+from .headless import iter_layouts, resolve_layout
+from .instrumentation import logger
+from .masks import FEATHER_FALLOFFS
+
+try:
+    from safetensors.torch import save_file
+except ImportError:
+    save_file = None
+
+
+def write_layout(path, resolved, fmt, width, height):
+    """Write one resolve_layout result: tensors as-is, prompts/regions/strengths as metadata."""
+    tensors = {
+        "masks": resolved["masks"].contiguous(),
+        "pixel_boxes": resolved["pixel_boxes"].contiguous(),
+        "latent_boxes": resolved["latent_boxes"].contiguous(),
+    }
+    info = {
+        "width": width,
+        "height": height,
+        "regions": resolved["regions"],
+        "prompts": resolved["prompts"],
+        "strengths": resolved["strengths"],
+    }
+    if fmt == "safetensors":
+        save_file(tensors, path, metadata={key: json.dumps(value) for key, value in info.items()})
+    else:
+        torch.save(dict(tensors, **info), path)
+
+
+def process_layout(line_number, layout, args):
+    resolved = resolve_layout(layout, args.width, args.height, soften_masks=not args.no_soften,
+                              feather_width=args.feather_width, feather_falloff=args.feather_falloff)
+    path = os.path.join(args.output, f"{line_number:0{args.digits}d}.{args.format}")
+    write_layout(path, resolved, args.format, args.width, args.height)
+    return line_number, len(resolved["regions"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m easyregion.cli",
+        description="Build EasyRegion region masks for a JSONL file of layouts, one output file per line",
+    )
+    parser.add_argument("layouts", help="JSONL layouts file, or - for stdin")
+    parser.add_argument("--width", type=int, required=True, help="output width in pixels (latent is width/8)")
+    parser.add_argument("--height", type=int, required=True, help="output height in pixels")
+    parser.add_argument("--output", required=True, help="directory for the mask files (created if missing)")
+    parser.add_argument("--format", choices=("safetensors", "pt"), default="safetensors")
+    parser.add_argument("--no-soften", action="store_true", help="hard mask edges (soften_masks off)")
+    parser.add_argument("--feather-width", type=int, default=6)
+    parser.add_argument("--feather-falloff", choices=FEATHER_FALLOFFS, default="linear")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (0 or 1 builds in this process)")
+    parser.add_argument("--digits", type=int, default=8, help="zero padding of the line-number file names")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.format == "safetensors" and save_file is None:
+        parser.error("safetensors is not installed - use --format pt")
+    os.makedirs(args.output, exist_ok=True)
+
+    source = sys.stdin if args.layouts == "-" else open(args.layouts, encoding="utf-8")
+    written = 0
+    try:
+        with source:
+            layouts = iter_layouts(source, args.width, args.height)
+            if args.workers <= 1:
+                for line_number, layout in layouts:
+                    process_layout(line_number, layout, args)
+                    written += 1
+            else:
+                # Keep a bounded number of layouts in flight, so huge files stream
+                # instead of being read into memory up front
+                with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                    pending = deque()
+                    try:
+                        for line_number, layout in layouts:
+                            pending.append(pool.submit(process_layout, line_number, layout, args))
+                            if len(pending) >= args.workers * 4:
+                                pending.popleft().result()
+                                written += 1
+                    finally:
+                        # Layouts already submitted still get written before a bad line stops the run
+                        while pending:
+                            pending.popleft().result()
+                            written += 1
+    except ValueError as e:
+        logger.error("❌ EasyRegion: %s (wrote masks for %d layouts to %s before stopping)", e, written, args.output)
+        raise SystemExit(1)
+
+    logger.info("✅ EasyRegion: wrote masks for %d layouts to %s", written, args.output)
+
+
+if __name__ == "__main__":
+    main()
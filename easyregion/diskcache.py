@@ -0,0 +1,184 @@
+# Persistent mask cache
+# Built region mask stacks only depend on layout geometry, so they can outlive
+# the process. With EASYREGION_MASK_CACHE_DIR set they are written there as
+# safetensors files named by a geometry hash and memory-mapped back (no copy,
+# no rebuild) on later runs - after a restart, or on another worker sharing the
+# directory. Total size is capped; the least recently used files are deleted
+# first. Dense attention masks stay out: at ~1 GB each they would crowd the
+# stacks out of the cap, and rebuilding one is cheaper than writing it.
+
+import json
+import os
+import struct
+import threading
+import uuid
+
+import torch
+
+from .instrumentation import STATS, logger
+from .results import content_hash
+
+try:
+    from safetensors.torch import save_file
+except ImportError:
+    save_file = None
+
+_SAFETENSORS_DTYPES = {
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+}
+_TENSOR_NAME = "mask"
+_SUFFIX = ".safetensors"
+
+
+def load_mapped(path):
+    """
+    Memory-map the tensor of a single-tensor safetensors file.
+
+    The returned CPU tensor reads straight from the page cache (a private
+    mapping - writes to it never reach the file).
+    """
+    with open(path, "rb") as f:
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    info = header[_TENSOR_NAME]
+    dtype = _SAFETENSORS_DTYPES[info["dtype"]]
+    start, end = info["data_offsets"]
+    offset = 8 + header_len + start
+    itemsize = torch.empty((), dtype=dtype).element_size()
+    if offset % itemsize:
+        raise ValueError(f"unaligned tensor data in {path}")
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+    tensor = torch.empty(0, dtype=dtype)
+    tensor.set_(storage, offset // itemsize, torch.Size(info["shape"]))
+    if tensor.numel() * itemsize != end - start:
+        raise ValueError(f"truncated tensor data in {path}")
+    return tensor
+
+
+class MaskDiskCache:
+    """
+    Directory of safetensors mask files keyed by geometry hash, with size-based LRU eviction.
+
+    File modification times are the LRU order (hits touch the file), so
+    several processes can share one directory. Disabled without a directory,
+    with max_bytes=0, or when safetensors isn't installed.
+    """
+
+    def __init__(self, directory=None, max_bytes=2048 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.directory) and self.max_bytes > 0 and save_file is not None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            tensor = load_mapped(path)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("⚠️  Ignoring unreadable mask cache file %s: %s", path, e)
+            self._remove(path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return tensor
+
+    def put(self, key, tensor):
+        size = tensor.numel() * tensor.element_size()
+        if size > self.max_bytes:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        # Write under a unique name and rename, so readers never see a partial file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            save_file({_TENSOR_NAME: tensor.detach().to("cpu").contiguous()}, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("⚠️  Could not write mask cache file %s: %s", path, e)
+            self._remove(tmp_path)
+            return
+        self.writes += 1
+        self.evict()
+
+    def fetch(self, geometry, build):
+        """Tensor for geometry (a tuple of JSON-able parts): mapped from disk, or build() and stored."""
+        if not self.enabled:
+            return build()
+        key = content_hash(*geometry)
+        tensor = self.get(key)
+        if tensor is None:
+            tensor = build()
+            self.put(key, tensor)
+        return tensor
+
+    def evict(self):
+        """Delete least recently used files until the directory fits in max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                return
+            for name in names:
+                if not name.endswith(_SUFFIX):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if self._remove(path):
+                    total -= size
+                    self.evictions += 1
+
+    def clear(self):
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(_SUFFIX):
+                self._remove(os.path.join(self.directory, name))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            # Already gone, or still mapped by a reader on Windows
+            return False
+
+
+# Unset EASYREGION_MASK_CACHE_DIR (the default) keeps masks in memory only
+MASK_DISK_CACHE = MaskDiskCache(
+    directory=os.environ.get("EASYREGION_MASK_CACHE_DIR") or None,
+    max_bytes=int(float(os.environ.get("EASYREGION_MASK_CACHE_MB", 2048)) * 1024 * 1024),
+)
+STATS.register_gauge("mask_disk_cache", lambda: {
+    "enabled": MASK_DISK_CACHE.enabled, "hits": MASK_DISK_CACHE.hits, "misses": MASK_DISK_CACHE.misses,
+    "writes": MASK_DISK_CACHE.writes, "evictions": MASK_DISK_CACHE.evictions,
+})
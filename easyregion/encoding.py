@@ -0,0 +1,152 @@
+# Prompt encoding helpers
+# Text encoding is the slowest part of both nodes, and most re-runs while
+# iterating on a layout only move boxes or change strengths. Cache the
+# (cond, pooled) pair per CLIP model + exact prompt text.
+
+import os
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+
+import torch
+
+from .instrumentation import STATS, span
+
+# Stable identity per CLIP object (id() can be reused after garbage collection)
+_clip_ids = weakref.WeakKeyDictionary()
+_clip_counter = itertools.count(1)
+
+
+def clip_identity(clip):
+    """Hashable identity for a CLIP object, including its applied patches (e.g. LoRAs)."""
+    try:
+        ident = _clip_ids.get(clip)
+        if ident is None:
+            ident = next(_clip_counter)
+            _clip_ids[clip] = ident
+    except TypeError:
+        # Not weak-referenceable - fall back to the (less safe) object id
+        ident = ("id", id(clip))
+    patcher = getattr(clip, "patcher", None)
+    return (ident, str(getattr(patcher, "patches_uuid", "")), getattr(clip, "layer_idx", None))
+
+
+def _tensor_bytes(t):
+    return t.numel() * t.element_size() if isinstance(t, torch.Tensor) else 0
+
+
+class PromptEncodingCache:
+    """
+    LRU cache of (cond, pooled) keyed by CLIP identity and prompt text.
+
+    Bounded by entry count and by total tensor bytes; the least recently
+    used entries are evicted first. max_entries=0 disables caching.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = sum(_tensor_bytes(t) for t in value)
+        with self._lock:
+            if self.max_entries <= 0 or size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# Shared by every EasyRegion node in the process
+# EASYREGION_ENCODE_CACHE_SIZE=0 disables caching
+ENCODE_CACHE = PromptEncodingCache(
+    max_entries=int(os.environ.get("EASYREGION_ENCODE_CACHE_SIZE", 64)),
+    max_bytes=int(float(os.environ.get("EASYREGION_ENCODE_CACHE_MB", 512)) * 1024 * 1024),
+)
+STATS.register_gauge("encode_cache", lambda: {
+    "entries": len(ENCODE_CACHE), "bytes": ENCODE_CACHE.total_bytes,
+    "hits": ENCODE_CACHE.hits, "misses": ENCODE_CACHE.misses,
+})
+
+
+def encode_prompts(clip, prompts, cache=None):
+    """
+    Encode several prompts with as few encoder passes as possible.
+
+    Empty prompts map to None, duplicates are encoded once and cached prompts
+    are skipped; each remaining prompt gets its own encode_from_tokens call
+    (stock ComfyUI CLIP objects can't split a merged pass back into exact
+    per-prompt results). Returns a list of (cond, pooled) aligned with prompts.
+    """
+    cache = ENCODE_CACHE if cache is None else cache
+    ident = clip_identity(clip)
+
+    results = {}
+    pending = []
+    for prompt in prompts:
+        if not prompt or not prompt.strip() or prompt in results or prompt in pending:
+            continue
+        cached = cache.get((ident, prompt))
+        if cached is not None:
+            results[prompt] = cached
+        else:
+            pending.append(prompt)
+
+    if pending:
+        with span("encode", prompts=len(pending)) as encode_span:
+            for prompt in pending:
+                encoded = clip.encode_from_tokens(clip.tokenize(prompt), return_pooled=True)
+                cache.put((ident, prompt), encoded)
+                results[prompt] = encoded
+                encode_span.add_bytes(encoded)
+
+    return [results[prompt] if prompt and prompt.strip() else None for prompt in prompts]
+
+
+def compose_with_background(background, region):
+    """
+    Prepend the background encoding to a region encoding.
+
+    Joins along the token axis the same way ComfyUI joins the chunks of an
+    over-length prompt, and keeps the background's pooled output (the first
+    chunk), matching ConditioningConcat. Lets the background be encoded once
+    instead of once per region.
+    """
+    background_cond, background_pooled = background
+    region_cond, region_pooled = region
+    cond = torch.cat([background_cond, region_cond.to(background_cond.dtype)], dim=1)
+    return cond, background_pooled if background_pooled is not None else region_pooled
+
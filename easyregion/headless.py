@@ -0,0 +1,89 @@
+# Headless layout resolution
+# The node's box handling (region_boxes JSON, saved workflow properties,
+# canvas -> output scaling, feathering) without a ComfyUI server: give it a
+# layout and an output size, get back resolved boxes and region masks. Used by
+# the command line tool in cli.py for offline batch preprocessing.
+
+import json
+
+import torch
+
+from .layout import normalize_layout, parse_layouts, region_box_array, resolve_region_values
+from .masks import build_region_masks, feather_sizes_for, resolve_latent_boxes
+
+
+def layout_from_node(width, height, region_boxes="", workflow=None, node_id=None, prompts=(), strengths=(),
+                     background_prompt=None, default_values=()):
+    """
+    Layout dict for a node as the graph would see it: boxes from the
+    region_boxes widget JSON, overridden by the node's saved properties in
+    workflow (the "workflow" entry of a saved image's metadata) when present.
+    """
+    extra_pnginfo = {"workflow": workflow} if workflow is not None else None
+    values, canvas_width, canvas_height = resolve_region_values(
+        region_boxes, extra_pnginfo, node_id, list(default_values), width, height, quiet=True,
+    )
+    return normalize_layout({
+        "boxes": values, "prompts": list(prompts), "strengths": list(strengths) or [1.0],
+        "canvas_width": canvas_width, "canvas_height": canvas_height, "background_prompt": background_prompt,
+    }, 1, width, height)
+
+
+def iter_layouts(lines, width, height):
+    """Parse layouts one JSONL line at a time (blank lines skipped), yielding (line_number, layout)."""
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            layout = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid layout JSON on line {line_number}: {e}") from e
+        yield line_number, normalize_layout(layout, line_number, width, height)
+
+
+def resolve_layout(layout, width, height, soften_masks=True, feather_width=6, feather_falloff="linear"):
+    """
+    Resolve one layout (as from parse_layouts) to boxes and masks.
+
+    Regions with an empty prompt or a malformed box are skipped, as are
+    fullscreen boxes (the node uses the background for those). Returns a dict:
+      regions       - 1-based region numbers that got a mask
+      prompts       - their prompts
+      strengths     - their strengths, clamped to 0-10 like the node
+      pixel_boxes   - (N, 4) int64 x, y, width, height in output pixels
+      latent_boxes  - (N, 4) int64 y_start, y_end, x_start, x_end in latent pixels
+      masks         - (N, H/8, W/8) float32 feathered region masks
+    """
+    values = layout["values"]
+    prompts = layout["region_prompts"]
+    strengths = layout["region_strengths"]
+    count = min(len(prompts), len(values))
+    boxes, valid = region_box_array(values)
+    selected = valid[:count] & torch.tensor([bool(p and p.strip()) for p in prompts[:count]], dtype=torch.bool)
+    rows = selected.nonzero().flatten()
+    regions = [k + 1 for k in rows.tolist()]
+
+    latent_shape = (height // 8, width // 8)
+    pixel_boxes, latent_boxes, latent_extent, keep = resolve_latent_boxes(
+        boxes[rows],
+        (int(layout["canvas_width"]), int(layout["canvas_height"])), (width, height),
+    )
+    if soften_masks:
+        feather_sizes = feather_sizes_for(latent_extent[keep], feather_width)
+    else:
+        feather_sizes = torch.zeros(int(keep.sum()), dtype=torch.int64)
+
+    kept = keep.nonzero().flatten().tolist()
+    return {
+        "regions": [regions[k] for k in kept],
+        "prompts": [prompts[regions[k] - 1] for k in kept],
+        "strengths": [max(0.0, min(10.0, strengths[regions[k] - 1])) for k in kept],
+        "pixel_boxes": pixel_boxes[keep],
+        "latent_boxes": latent_boxes[keep],
+        "masks": build_region_masks(latent_boxes[keep], latent_shape, feather_sizes, feather_falloff),
+    }
+
+
+def resolve_layouts(text, width, height, **options):
+    """resolve_layout for every layout in a JSON list / JSONL string."""
+    return [resolve_layout(layout, width, height, **options) for layout in parse_layouts(text, width, height)]
@@ -0,0 +1,111 @@
+# Logging and per-stage timing
+# Every stage of a node run (parsing, encoding, mask building, feathering,
+# attention masks) runs inside a span that records its wall time and the bytes
+# of tensors it produced. Spans are aggregated in-process for scraping and
+# logged at DEBUG; node summaries go through the "EasyRegion" logger.
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import torch
+
+logger = logging.getLogger("EasyRegion")
+
+
+def tensor_nbytes(*values):
+    """Bytes held by tensors in values (nested lists/tuples/dicts are walked)."""
+    total = 0
+    for value in values:
+        if isinstance(value, torch.Tensor):
+            total += value.numel() * value.element_size()
+        elif isinstance(value, (list, tuple)):
+            total += tensor_nbytes(*value)
+        elif isinstance(value, dict):
+            total += tensor_nbytes(*value.values())
+    return total
+
+
+class Span:
+    """One timed stage. Add tensor bytes while it runs."""
+
+    __slots__ = ("name", "fields", "nbytes", "seconds")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.nbytes = 0
+        self.seconds = 0.0
+
+    def add_bytes(self, *values):
+        self.nbytes += tensor_nbytes(*values)
+
+
+class StageStats:
+    """Thread-safe aggregate of span timings and byte counts, per stage name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._gauges = {}
+        self._since = time.time()
+
+    def record(self, span):
+        with self._lock:
+            entry = self._stages.get(span.name)
+            if entry is None:
+                entry = self._stages[span.name] = {
+                    "count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "last_seconds": 0.0,
+                    "total_bytes": 0, "last_bytes": 0,
+                }
+            entry["count"] += 1
+            entry["total_seconds"] += span.seconds
+            entry["max_seconds"] = max(entry["max_seconds"], span.seconds)
+            entry["last_seconds"] = span.seconds
+            entry["total_bytes"] += span.nbytes
+            entry["last_bytes"] = span.nbytes
+
+    def register_gauge(self, name, read):
+        """Add a callable whose (JSON-able) value is reported with every snapshot, e.g. cache sizes."""
+        with self._lock:
+            self._gauges[name] = read
+
+    def snapshot(self):
+        with self._lock:
+            stages = {}
+            for name, entry in self._stages.items():
+                stages[name] = dict(entry, mean_seconds=entry["total_seconds"] / entry["count"])
+            gauges = dict(self._gauges)
+            since = self._since
+        return {
+            "since": since,
+            "stages": stages,
+            "gauges": {name: read() for name, read in gauges.items()},
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._since = time.time()
+
+
+STATS = StageStats()
+
+
+@contextmanager
+def span(name, **fields):
+    """Time a stage: with span("encode", prompts=3) as s: ...; s.add_bytes(tensors)."""
+    current = Span(name, fields)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        STATS.record(current)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "%s took %.2f ms, %d tensor bytes %s", name, current.seconds * 1000, current.nbytes, current.fields,
+                extra={"easyregion_span": {"name": name, "seconds": current.seconds,
+                                           "tensor_bytes": current.nbytes, **current.fields}},
+            )
@@ -0,0 +1,268 @@
+# Region layout resolution
+# The boxes a node actually uses come from three places: its default template,
+# the hidden region_boxes widget (JSON), and the saved workflow's node
+# properties (which override the widget when present). Saved workflows are
+# indexed by node id once per prompt execution, and boxes are validated in one
+# pass into int tensors, so the nodes do no per-region parsing.
+
+import json
+import math
+import threading
+from collections import OrderedDict
+
+import torch
+
+from .instrumentation import logger, span
+
+# Node indexes of recent workflows (one per prompt execution). Entries hold
+# their workflow, so its id() can't be reused while cached
+_INDEX_CACHE_SIZE = 4
+_workflow_indexes = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def _build_node_index(nodes):
+    index = {}
+    for position, node in enumerate(nodes):
+        if isinstance(node, dict) and "id" in node:
+            index.setdefault(node["id"], position)
+    return index
+
+
+def find_workflow_node(workflow, node_id):
+    """
+    The node with id node_id in a saved workflow (extra_pnginfo["workflow"]), or None.
+
+    ComfyUI hands every node of a prompt the same workflow object, so the
+    {id: position} index is built once per prompt execution and shared by all
+    EasyRegion nodes. Every hit is checked against the live node list, and a
+    miss or a stale entry (nodes edited in place) rebuilds the index, so the
+    result always matches a linear scan: the first node with that id.
+    """
+    nodes = workflow.get("nodes", [])
+    with _index_lock:
+        entry = _workflow_indexes.get(id(workflow))
+        if entry is not None and entry[0] is workflow and entry[1] is nodes:
+            _workflow_indexes.move_to_end(id(workflow))
+            position = entry[2].get(node_id)
+            if position is not None and position < len(nodes):
+                node = nodes[position]
+                if isinstance(node, dict) and node.get("id") == node_id:
+                    return node
+
+    index = _build_node_index(nodes)
+    with _index_lock:
+        _workflow_indexes[id(workflow)] = (workflow, nodes, index)
+        _workflow_indexes.move_to_end(id(workflow))
+        while len(_workflow_indexes) > _INDEX_CACHE_SIZE:
+            _workflow_indexes.popitem(last=False)
+    position = index.get(node_id)
+    return None if position is None else nodes[position]
+
+
+def region_area_array(values, default_strength=None):
+    """
+    Validate a region list in one pass, as (boxes, strengths, valid).
+
+    boxes is an (N, 4) int64 tensor of [x, y, w, h] (the int() of the first
+    four entries of each row); valid is an (N,) bool tensor, False for rows
+    that aren't at least four numbers (their boxes row is zeros). With a
+    default_strength, strengths is an (N,) float64 tensor of each row's fifth
+    entry (default_strength when it has none) and rows whose strength isn't a
+    finite number are invalid too; without one, strengths is None.
+    """
+    rows = []
+    strengths = []
+    valid = []
+    for value in values:
+        try:
+            row = [int(value[0]), int(value[1]), int(value[2]), int(value[3])]
+            if default_strength is not None:
+                strength = float(value[4]) if len(value) > 4 else float(default_strength)
+                if not math.isfinite(strength):
+                    raise ValueError(f"non-finite strength {strength}")
+        except (IndexError, KeyError, ValueError, TypeError, OverflowError):
+            rows.append([0, 0, 0, 0])
+            strengths.append(0.0)
+            valid.append(False)
+            continue
+        rows.append(row)
+        strengths.append(strength if default_strength is not None else 0.0)
+        valid.append(True)
+    boxes = torch.tensor(rows, dtype=torch.int64).reshape(-1, 4)
+    valid = torch.tensor(valid, dtype=torch.bool)
+    if default_strength is None:
+        return boxes, None, valid
+    return boxes, torch.tensor(strengths, dtype=torch.float64), valid
+
+
+def region_box_array(values):
+    """Validated boxes of a region list, as (boxes, valid) - see region_area_array."""
+    boxes, _, valid = region_area_array(values)
+    return boxes, valid
+
+
+def resolve_region_values(region_boxes, extra_pnginfo, unique_id, default_values, width, height, quiet=False):
+    """
+    Resolve the effective region boxes and canvas size for a node.
+
+    Returns (values, canvas_width, canvas_height). The canvas size defaults to
+    width x height unless the saved workflow stores one. quiet=True skips the
+    status log lines (e.g. from IS_CHANGED).
+    """
+    values = default_values
+    canvas_width = width
+    canvas_height = height
+
+    with span("parse"):
+        # First try to parse from hidden widget (works on fresh nodes)
+        if region_boxes:
+            try:
+                parsed = json.loads(region_boxes)
+                if parsed and len(parsed) > 0:
+                    values = parsed
+                    if not quiet:
+                        logger.debug("Using region boxes from widget: %s", values)
+            except Exception as e:
+                if not quiet:
+                    logger.warning("⚠️  Failed to parse region_boxes widget: %s", e)
+
+        # Fallback: Get region data from saved workflow (overrides if available)
+        try:
+            if extra_pnginfo and "workflow" in extra_pnginfo and "nodes" in extra_pnginfo["workflow"]:
+                node = find_workflow_node(extra_pnginfo["workflow"], int(unique_id))
+                if node is not None:
+                    saved_values = node["properties"].get("values", [])
+                    if saved_values:  # Only override if we actually have saved values
+                        values = saved_values
+                    # Override with property dimensions if available
+                    canvas_width = node["properties"].get("width", width)
+                    canvas_height = node["properties"].get("height", height)
+        except Exception:
+            if not quiet:
+                logger.info("ℹ️  Using default template boxes and canvas size %dx%d", width, height)
+            canvas_width = width
+            canvas_height = height
+
+    return values, canvas_width, canvas_height
+
+
+def parse_strengths(text, count, default=1.0):
+    """
+    Parse comma-separated region strengths, padded to count.
+
+    Invalid entries (including nan and inf) are skipped; the last value
+    repeats for any remaining regions. Returns (strengths, invalid_parts).
+    """
+    strengths = []
+    invalid = []
+    for part in (text or "").split(","):
+        if not part.strip():
+            continue
+        try:
+            strength = float(part)
+        except ValueError:
+            invalid.append(part.strip())
+            continue
+        if not math.isfinite(strength):
+            invalid.append(part.strip())
+            continue
+        strengths.append(strength)
+    if not strengths:
+        strengths = [default]
+    strengths += [strengths[-1]] * max(0, count - len(strengths))
+    return strengths, invalid
+
+
+def parse_resolutions(text):
+    """
+    Parse output resolutions written as WIDTHxHEIGHT, separated by commas or
+    newlines (e.g. "2016x1152, 2688x1536"). Entries that aren't two positive
+    integers are skipped. Returns (sizes as (width, height) tuples, invalid_parts).
+    """
+    sizes = []
+    invalid = []
+    for part in (text or "").replace("\n", ",").split(","):
+        if not part.strip():
+            continue
+        try:
+            width, height = (int(v) for v in part.lower().replace("×", "x").split("x"))
+        except ValueError:
+            invalid.append(part.strip())
+            continue
+        if width < 8 or height < 8:
+            invalid.append(part.strip())
+            continue
+        sizes.append((width, height))
+    return sizes, invalid
+
+
+def normalize_layout(layout, index, width, height):
+    """One parsed layout object -> the layout dict the mask pipeline uses (index is for error messages)."""
+    if not isinstance(layout, dict):
+        raise ValueError(f"Layout {index}: expected an object, got {type(layout).__name__}")
+    boxes = layout.get("boxes", [])
+    prompts = layout.get("prompts", [])
+    if not isinstance(boxes, list) or not isinstance(prompts, list):
+        raise ValueError(f"Layout {index}: 'boxes' and 'prompts' must be lists")
+
+    strengths = layout.get("strengths", [])
+    if isinstance(strengths, (int, float)) and not isinstance(strengths, bool):
+        strengths = [strengths]
+    if isinstance(strengths, str):
+        strengths, _ = parse_strengths(strengths, len(prompts))
+    elif isinstance(strengths, list):
+        try:
+            strengths = [float(v) for v in strengths] or [1.0]
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Layout {index}: 'strengths' must be numbers ({e})") from e
+        if not all(math.isfinite(v) for v in strengths):
+            raise ValueError(f"Layout {index}: 'strengths' must be finite numbers")
+        strengths += [strengths[-1]] * max(0, len(prompts) - len(strengths))
+    else:
+        raise ValueError(f"Layout {index}: 'strengths' must be a number, a list or a comma-separated string")
+
+    try:
+        canvas_width = int(layout.get("canvas_width", width))
+        canvas_height = int(layout.get("canvas_height", height))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Layout {index}: 'canvas_width' and 'canvas_height' must be integers ({e})") from e
+    if canvas_width <= 0 or canvas_height <= 0:
+        raise ValueError(f"Layout {index}: 'canvas_width' and 'canvas_height' must be positive "
+                         f"(got {canvas_width}x{canvas_height})")
+
+    return {
+        "values": boxes,
+        "canvas_width": canvas_width,
+        "canvas_height": canvas_height,
+        "background_prompt": layout.get("background_prompt"),
+        "region_prompts": [str(p) if p is not None else "" for p in prompts],
+        "region_strengths": strengths,
+    }
+
+
+def parse_layouts(text, width, height):
+    """
+    Parse a batch of region layouts from JSON (a list of objects) or JSONL.
+
+    Each layout is {"boxes": [[x, y, w, h], ...], "prompts": [...]} with
+    optional "strengths" (a number, a list or a comma-separated string; the
+    last value repeats), "canvas_width"/"canvas_height" (default width x height) and
+    "background_prompt" (default: the node's). Raises ValueError on bad input.
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    try:
+        parsed = json.loads(text)
+        layouts = parsed if isinstance(parsed, list) else [parsed]
+    except json.JSONDecodeError:
+        layouts = []
+        for line_number, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                layouts.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid layout JSON on line {line_number}: {e}") from e
+    return [normalize_layout(layout, i + 1, width, height) for i, layout in enumerate(layouts)]
@@ -0,0 +1,156 @@
+# Deferred tensors
+# Conditioning masks are only needed once sampling starts, on the sampling
+# device. These stand-ins keep the geometry, pretend to be a tensor, and build
+# the real values directly on the device/dtype a consumer asks for - skipping
+# the host-side allocation and the host-to-device copy.
+
+import threading
+import weakref
+
+import torch
+
+
+def _first_tensor_device(value):
+    """Device of the first real tensor found in (nested) torch function arguments."""
+    if isinstance(value, torch.Tensor):
+        return value.device
+    if isinstance(value, (list, tuple)):
+        values = value
+    elif isinstance(value, dict):
+        values = value.values()
+    else:
+        return None
+    for v in values:
+        device = _first_tensor_device(v)
+        if device is not None:
+            return device
+    return None
+
+
+class LazyTensor:
+    """
+    Base class for tensor stand-ins that materialize on first use.
+
+    Subclasses implement shape and build(device, dtype). Materialized tensors
+    are cached per (device, dtype), so the sampler's repeated .to(device) calls
+    build once. Subclasses whose dense form is large set weak_cache = True:
+    the cached tensor then lives only as long as a consumer holds it.
+    """
+
+    weak_cache = False
+
+    def __init__(self, dtype=torch.float32):
+        self.dtype = dtype
+        self.device = torch.device("cpu")
+        self._materialized = weakref.WeakValueDictionary() if self.weak_cache else {}
+        self._materialize_lock = threading.Lock()
+
+    # ---- structure -------------------------------------------------------
+
+    @property
+    def shape(self):
+        raise NotImplementedError
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def dim(self):
+        return self.ndim
+
+    def size(self, dim=None):
+        return self.shape if dim is None else self.shape[dim]
+
+    def numel(self):
+        return self.shape.numel()
+
+    def element_size(self):
+        return torch.empty((), dtype=self.dtype).element_size()
+
+    # ---- materialization -------------------------------------------------
+
+    def build(self, device, dtype):
+        """Build the dense tensor on device with dtype."""
+        raise NotImplementedError
+
+    def materialize(self, device=None, dtype=None):
+        """Dense tensor on device/dtype, built there on first request and cached."""
+        device = torch.device(device) if device is not None else self.device
+        dtype = dtype or self.dtype
+        key = (str(device), dtype)
+        with self._materialize_lock:
+            tensor = self._materialized.get(key)
+            if tensor is None:
+                tensor = self.build(device, dtype)
+                self._materialized[key] = tensor
+        return tensor
+
+    def to_dense(self, device=None, dtype=None):
+        return self.materialize(device, dtype)
+
+    # ---- tensor protocol -------------------------------------------------
+
+    def __getitem__(self, key):
+        return self.materialize()[key]
+
+    def to(self, *args, **kwargs):
+        device, dtype, non_blocking, _ = torch._C._nn._parse_to(*args, **kwargs)
+        return self.materialize(device, dtype)
+
+    def cpu(self):
+        return self.materialize(torch.device("cpu"))
+
+    def cuda(self, device=None):
+        return self.materialize(torch.device("cuda") if device is None else torch.device("cuda", device))
+
+    @classmethod
+    def __torch_function__(cls, func, types, args=(), kwargs=None):
+        kwargs = kwargs or {}
+        # Materialize next to the other operands instead of on the host
+        device = _first_tensor_device(args) or _first_tensor_device(kwargs)
+
+        def expand(value):
+            if isinstance(value, LazyTensor):
+                return value.materialize(device)
+            if isinstance(value, (list, tuple)):
+                return type(value)(expand(v) for v in value)
+            if isinstance(value, dict):
+                return {k: expand(v) for k, v in value.items()}
+            return value
+
+        return func(*expand(args), **expand(kwargs))
+
+    def __getattr__(self, name):
+        # Anything else a consumer needs (repeat, view, ...) works on the dense form
+        if name.startswith("__") or name.startswith("_materializ"):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_materialized", None)
+        state.pop("_materialize_lock", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._materialized = weakref.WeakValueDictionary() if self.weak_cache else {}
+        self._materialize_lock = threading.Lock()
+
+
+def _delegate_operator(name):
+    def operator(self, *args):
+        device = _first_tensor_device(args)
+        args = [a.materialize(device) if isinstance(a, LazyTensor) else a for a in args]
+        return getattr(self.materialize(device), name)(*args)
+    operator.__name__ = name
+    return operator
+
+
+# Arithmetic and comparisons run on the dense form
+for _name in ("add", "radd", "sub", "rsub", "mul", "rmul", "truediv", "rtruediv", "pow", "neg",
+              "lt", "le", "gt", "ge", "and", "or", "invert"):
+    setattr(LazyTensor, f"__{_name}__", _delegate_operator(f"__{_name}__"))
@@ -0,0 +1,377 @@
+# Region mask construction
+# Builds latent masks for rectangular regions with optional edge feathering,
+# for all regions of a layout in one broadcast pass. Finished masks are
+# memoized since the same layout is usually rebuilt on every queue, and can be
+# deferred until the sampler asks for them on its own device.
+
+from collections import OrderedDict
+import math
+import os
+import threading
+
+import torch
+
+from .diskcache import MASK_DISK_CACHE
+from .instrumentation import STATS, span
+from .lazy import LazyTensor
+
+FEATHER_FALLOFFS = ("linear", "smoothstep", "gaussian")
+
+# Downsample factors of the latent that models attend at (UNet levels / DiT patching)
+PYRAMID_FACTORS = (1, 2, 4, 8)
+
+# Width of the gaussian falloff curve relative to the feather band
+_GAUSSIAN_SIGMA = 0.4
+
+# Memoized stacks are bounded by count and by total tensor bytes - one 4K layout
+# with many regions is tens of MB in float32
+_MASK_CACHE_SIZE = 256
+_MASK_CACHE_BYTES = int(float(os.environ.get("EASYREGION_MASK_MEMORY_MB", 1024)) * 1024 * 1024)
+_mask_cache = OrderedDict()
+_mask_cache_bytes = 0
+_mask_cache_lock = threading.Lock()
+
+
+def apply_falloff(ramp, falloff):
+    """Map a 0..1 edge ramp through the selected falloff curve."""
+    if falloff == "linear":
+        return ramp
+    if falloff == "smoothstep":
+        return ramp * ramp * (3.0 - 2.0 * ramp)
+    if falloff == "gaussian":
+        return torch.exp(-((1.0 - ramp) ** 2) / (2.0 * _GAUSSIAN_SIGMA ** 2))
+    raise ValueError(f"Unknown feather falloff '{falloff}' (expected one of {FEATHER_FALLOFFS})")
+
+
+def resolve_latent_boxes(boxes, canvas_size, output_size):
+    """
+    Convert canvas pixel boxes to output pixels and latent spans, all boxes at once.
+
+    boxes is an (N, 4) integer tensor of [x, y, w, h] on a canvas of canvas_size
+    (width, height) - or an (N, 2) tensor of per-box canvas sizes when boxes
+    from several layouts are resolved together. Applies the same rules as the
+    per-region loop did: skip fullscreen boxes, scale canvas -> output
+    (truncating), clip to the output bounds, drop empty boxes, then divide by 8
+    for the latent.
+
+    Returns (pixel_boxes, latent_boxes, latent_extent, keep):
+      pixel_boxes   (N, 4) [x, y, w, h] in output pixels
+      latent_boxes  (N, 4) [y_start, y_end, x_start, x_end], end exclusive
+      latent_extent (N, 2) [w_latent, h_latent] before clipping to the latent
+      keep          (N,) bool - False for fullscreen or empty boxes
+    """
+    boxes = torch.as_tensor(boxes, dtype=torch.int64).reshape(-1, 4)
+    canvas = torch.as_tensor(canvas_size, dtype=torch.int64).reshape(-1, 2)
+    canvas_width, canvas_height = canvas[:, 0], canvas[:, 1]
+    width, height = int(output_size[0]), int(output_size[1])
+    x, y, w, h = boxes.unbind(dim=1)
+
+    # Fullscreen boxes duplicate the background
+    keep = ~((x == 0) & (y == 0) & (w == canvas_width) & (h == canvas_height))
+
+    if bool(((canvas_width != width) | (canvas_height != height)).any()):
+        # float64 division + truncation matches int(x * width / canvas_width)
+        x = torch.trunc((x * width).double() / canvas_width).long()
+        y = torch.trunc((y * height).double() / canvas_height).long()
+        w = torch.trunc((w * width).double() / canvas_width).long()
+        h = torch.trunc((h * height).double() / canvas_height).long()
+
+    x = x.clamp(0, width)
+    y = y.clamp(0, height)
+    w = torch.minimum(w, width - x).clamp(min=0)
+    h = torch.minimum(h, height - y).clamp(min=0)
+    keep &= (w > 0) & (h > 0)
+
+    latent_width, latent_height = width // 8, height // 8
+    x_latent = x // 8
+    y_latent = y // 8
+    w_latent = (w // 8).clamp(min=1)
+    h_latent = (h // 8).clamp(min=1)
+    x_end = torch.minimum(x_latent + w_latent, torch.tensor(latent_width))
+    y_end = torch.minimum(y_latent + h_latent, torch.tensor(latent_height))
+
+    pixel_boxes = torch.stack([x, y, w, h], dim=1)
+    latent_boxes = torch.stack([y_latent, y_end, x_latent, x_end], dim=1)
+    latent_extent = torch.stack([w_latent, h_latent], dim=1)
+    return pixel_boxes, latent_boxes, latent_extent, keep
+
+
+def rectangle_union(areas):
+    """
+    Bounding area of several ComfyUI areas (h, w, y, x) if their union is
+    exactly that rectangle, else None - area conditioning can only express
+    one rectangle per block.
+    """
+    top = min(a[2] for a in areas)
+    left = min(a[3] for a in areas)
+    bottom = max(a[2] + a[0] for a in areas)
+    right = max(a[3] + a[1] for a in areas)
+    covered = torch.zeros((bottom - top, right - left), dtype=torch.bool)
+    for h, w, y, x in areas:
+        covered[y - top:y - top + h, x - left:x - left + w] = True
+    if not bool(covered.all()):
+        return None
+    return (bottom - top, right - left, top, left)
+
+
+def feather_sizes_for(latent_extent, feather_width=6):
+    """
+    Feather band in latent pixels for an (N, 2) [w_latent, h_latent] tensor -
+    never more than a quarter of a region's smaller side.
+    """
+    latent_extent = torch.as_tensor(latent_extent, dtype=torch.int64).reshape(-1, 2)
+    quarter = torch.minimum(latent_extent[:, 0] // 4, latent_extent[:, 1] // 4)
+    return quarter.clamp(max=int(feather_width)).clamp(min=0)
+
+
+def _edge_distance(starts, ends, size, device=None):
+    """
+    Per-position distance into [start, end) spans along one axis, for N spans.
+
+    Returns (inside, near, far), each (N, size): near is the distance to the
+    closest edge, far to the opposite edge.
+    """
+    coords = torch.arange(size, dtype=torch.int64, device=device)[None, :]
+    starts = starts[:, None]
+    ends = ends[:, None]
+    inside = (coords >= starts) & (coords < ends)
+    from_start = coords - starts
+    from_end = ends - 1 - coords
+    return inside, torch.minimum(from_start, from_end), torch.maximum(from_start, from_end)
+
+
+def build_region_masks(boxes, latent_shape, feather_sizes=0, falloff="linear", dtype=torch.float32, device=None):
+    """
+    Build an (N, H, W) float32 stack of region masks in one broadcast pass.
+
+    boxes is (N, 4) [y_start, y_end, x_start, x_end] in latent pixels, end
+    exclusive; feather_sizes is a scalar or (N,) tensor. Each mask is 1.0
+    inside its box, 0.0 outside, feathered at the edges. The feather ramps from
+    1/feather_size at the edge to 1.0 feather_size pixels in. With "linear"
+    falloff the result is identical to the original per-edge loop, including
+    its corner rule (the top/bottom edge ramp wins over the left/right one
+    wherever both apply). dtype sets the storage precision of the result and
+    device where it is built.
+    """
+    boxes = torch.as_tensor(boxes, dtype=torch.int64, device=device).reshape(-1, 4)
+    latent_height, latent_width = int(latent_shape[0]), int(latent_shape[1])
+
+    with span("masks", regions=boxes.shape[0], device=str(device or "cpu")) as mask_span:
+        feather = torch.as_tensor(feather_sizes, dtype=torch.int64, device=device).expand(boxes.shape[0])[:, None, None]
+
+        inside_y, row_near, row_far = _edge_distance(boxes[:, 0], boxes[:, 1], latent_height, device)
+        inside_x, col_near, _ = _edge_distance(boxes[:, 2], boxes[:, 3], latent_width, device)
+        inside = inside_y[:, :, None] & inside_x[:, None, :]
+
+        with span("feather", falloff=falloff) as feather_span:
+            row_near, row_far, col_near = row_near[:, :, None], row_far[:, :, None], col_near[:, None, :]
+
+            # Rows within the band take the ramp of the later-written edge (tiny, clipped
+            # boxes can have a row in both the top and bottom band); other rows use the
+            # left/right ramp
+            row_distance = torch.where(row_far < feather, row_far, row_near)
+            distance = torch.where(row_near < feather, row_distance, col_near)
+
+            # float64 ramp so linear values round to float32 exactly like (i + 1) / feather_size did
+            ramp = ((distance + 1).to(torch.float64) / feather.clamp(min=1)).clamp(max=1.0)
+            weights = torch.where(feather > 0, apply_falloff(ramp, falloff), 1.0)
+            feather_span.add_bytes(weights)
+
+        masks = torch.where(inside, weights, 0.0).to(torch.float32).to(dtype)
+        mask_span.add_bytes(masks)
+    return masks
+
+
+def _memoized(key, build):
+    global _mask_cache_bytes
+    with _mask_cache_lock:
+        entry = _mask_cache.get(key)
+        if entry is not None:
+            _mask_cache.move_to_end(key)
+            return entry[0]
+
+    mask = build()
+    size = mask.numel() * mask.element_size()
+
+    with _mask_cache_lock:
+        # Stacks larger than the whole budget are returned but not kept
+        if size > _MASK_CACHE_BYTES:
+            return mask
+        old = _mask_cache.pop(key, None)
+        if old is not None:
+            _mask_cache_bytes -= old[1]
+        _mask_cache[key] = (mask, size)
+        _mask_cache_bytes += size
+        while len(_mask_cache) > _MASK_CACHE_SIZE or _mask_cache_bytes > _MASK_CACHE_BYTES:
+            _, (_, evicted_size) = _mask_cache.popitem(last=False)
+            _mask_cache_bytes -= evicted_size
+    return mask
+
+
+def region_masks(boxes, latent_shape, feather_sizes=0, falloff="linear", dtype=torch.float32):
+    """
+    Memoized build_region_masks for a whole layout. Returns an (N, H, W) stack.
+
+    Shared between calls with the same boxes, latent size, feather params and
+    dtype - treat the result as read-only.
+    """
+    boxes = torch.as_tensor(boxes, dtype=torch.int64).reshape(-1, 4)
+    feather_sizes = torch.as_tensor(feather_sizes, dtype=torch.int64).expand(boxes.shape[0])
+    latent_shape = tuple(int(v) for v in latent_shape)
+    key = ("stack", tuple(map(tuple, boxes.tolist())), latent_shape, tuple(feather_sizes.tolist()), falloff, str(dtype))
+    # Misses here fall back to the on-disk cache (when configured) before building
+    return _memoized(key, lambda: MASK_DISK_CACHE.fetch(
+        key, lambda: build_region_masks(boxes, latent_shape, feather_sizes, falloff, dtype)
+    ))
+
+
+class RegionMaskStack(LazyTensor):
+    """
+    Deferred (N, H, W) region_masks stack for one layout.
+
+    Built in one pass on whichever device asks first (memoized as usual on the
+    CPU), then cached per device. region(k) hands out per-region views.
+    """
+
+    def __init__(self, boxes, latent_shape, feather_sizes=0, falloff="linear", dtype=torch.float32):
+        super().__init__(dtype)
+        self.boxes = torch.as_tensor(boxes, dtype=torch.int64).reshape(-1, 4)
+        self.latent_shape = tuple(int(v) for v in latent_shape)
+        self.feather_sizes = torch.as_tensor(feather_sizes, dtype=torch.int64).expand(self.boxes.shape[0]).clone()
+        self.falloff = falloff
+
+    @property
+    def shape(self):
+        return torch.Size((self.boxes.shape[0],) + self.latent_shape)
+
+    def build(self, device, dtype):
+        if device.type == "cpu":
+            # Reduced precision is a cast of the float32 build, so share its cache entry
+            return region_masks(self.boxes, self.latent_shape, self.feather_sizes, self.falloff).to(dtype)
+        return build_region_masks(self.boxes, self.latent_shape, self.feather_sizes, self.falloff, dtype, device)
+
+    def region(self, index, weights=None):
+        """
+        Deferred (1, H, W) mask of one region - or, for a list of indices, their
+        union (per-pixel max), each scaled by its weight first.
+        """
+        return RegionMask(self, index, weights)
+
+    def __repr__(self):
+        return (f"RegionMaskStack(regions={self.boxes.shape[0]}, latent_shape={self.latent_shape}, "
+                f"falloff={self.falloff!r}, dtype={self.dtype})")
+
+
+class RegionMask(LazyTensor):
+    """Deferred (1, H, W) mask of one region (or a union of regions) from a shared RegionMaskStack."""
+
+    def __init__(self, stack, index, weights=None):
+        super().__init__(stack.dtype)
+        self.stack = stack
+        self.indices = [int(index)] if isinstance(index, int) else [int(i) for i in index]
+        self.weights = None if weights is None else [float(w) for w in weights]
+
+    @property
+    def index(self):
+        return self.indices[0]
+
+    @property
+    def shape(self):
+        return torch.Size((1,) + self.stack.latent_shape)
+
+    def build(self, device, dtype):
+        masks = self.stack.materialize(device, dtype)
+        if len(self.indices) == 1 and self.weights is None:
+            return masks[self.index:self.index + 1]
+        members = masks[self.indices]
+        if self.weights is not None:
+            members = members * torch.tensor(self.weights, dtype=members.dtype, device=members.device)[:, None, None]
+        return members.amax(dim=0, keepdim=True)
+
+    def __repr__(self):
+        boxes = [tuple(self.stack.boxes[i].tolist()) for i in self.indices]
+        return f"RegionMask(indices={self.indices}, boxes={boxes}, dtype={self.dtype})"
+
+
+def pyramid_size(latent_shape, factor):
+    """(H, W) of a latent downsampled by factor - stride-2 convolutions round up."""
+    return (math.ceil(int(latent_shape[0]) / factor), math.ceil(int(latent_shape[1]) / factor))
+
+
+def resize_masks(masks, size):
+    """
+    Resize (N, H, W) masks to size the way ComfyUI's sampler does on the fly
+    (bilinear, align_corners=False). Half precision masks are resized in float32.
+    """
+    size = (int(size[0]), int(size[1]))
+    if tuple(masks.shape[-2:]) == size:
+        return masks
+    source = masks if masks.dtype == torch.float32 else masks.float()
+    resized = torch.nn.functional.interpolate(source.unsqueeze(1), size=size, mode="bilinear", align_corners=False)
+    return resized.squeeze(1).to(masks.dtype)
+
+
+class MaskLevel(LazyTensor):
+    """Deferred copy of a region mask resized to one pyramid level."""
+
+    def __init__(self, source, size):
+        super().__init__(source.dtype)
+        self.source = source
+        self.latent_shape = (int(size[0]), int(size[1]))
+
+    @property
+    def shape(self):
+        return torch.Size((1,) + self.latent_shape)
+
+    def build(self, device, dtype):
+        source = self.source
+        if isinstance(source, LazyTensor):
+            source = source.materialize(device, dtype)
+        else:
+            source = source.to(device=device, dtype=dtype)
+        with span("pyramid", size=self.latent_shape) as pyramid_span:
+            level = resize_masks(source, self.latent_shape)
+            pyramid_span.add_bytes(level)
+        return level
+
+    def __repr__(self):
+        return f"MaskLevel(size={self.latent_shape}, source={self.source!r})"
+
+
+def mask_pyramid(mask, factors=PYRAMID_FACTORS):
+    """
+    {(H, W): mask} for each downsample factor of a (1, H, W) region mask.
+
+    Levels are resized from the full-resolution (already feathered) mask, so
+    they hold exactly what on-the-fly interpolation would produce, and are
+    built once per device the first time they are read.
+    """
+    latent_shape = tuple(mask.shape[-2:])
+    pyramid = {}
+    for factor in factors:
+        size = pyramid_size(latent_shape, factor)
+        if size not in pyramid:
+            pyramid[size] = mask if size == latent_shape else MaskLevel(mask, size)
+    return pyramid
+
+
+def mask_for_size(options, size):
+    """
+    The region mask of a conditioning entry at size (H, W): the precomputed
+    pyramid level when the entry has one, otherwise resized on the fly.
+    """
+    size = (int(size[0]), int(size[1]))
+    level = options.get("mask_pyramid", {}).get(size)
+    if level is not None:
+        return level
+    return resize_masks(options["mask"], size)
+
+
+def clear_mask_cache():
+    global _mask_cache_bytes
+    with _mask_cache_lock:
+        _mask_cache.clear()
+        _mask_cache_bytes = 0
+
+
+STATS.register_gauge("mask_cache", lambda: {"entries": len(_mask_cache), "bytes": _mask_cache_bytes})
@@ -0,0 +1,93 @@
+# Memory budget planning for mask-based conditioning
+# Estimates what the region masks, attention masks and encoded prompts will
+# cost before the masks are allocated, and downgrades storage precision to fit
+# a budget instead of exhausting host memory on large resolutions.
+
+import os
+
+import torch
+
+from .masks import PYRAMID_FACTORS
+
+_DTYPES = {"float16": torch.float16, "bfloat16": torch.bfloat16}
+
+# EASYREGION_MEMORY_BUDGET_MB - host memory allowed for masks + conditioning
+DEFAULT_BUDGET_BYTES = int(float(os.environ.get("EASYREGION_MEMORY_BUDGET_MB", 4096)) * 1024 * 1024)
+# EASYREGION_HALF_DTYPE - reduced precision to fall back to (float16 or bfloat16)
+HALF_DTYPE = _DTYPES.get(os.environ.get("EASYREGION_HALF_DTYPE", "float16"), torch.float16)
+
+
+def _itemsize(dtype):
+    return torch.empty((), dtype=dtype).element_size()
+
+
+def _mb(num_bytes):
+    return num_bytes / (1024 * 1024)
+
+
+class MemoryPlan:
+    """Storage dtypes chosen for one node run, with the estimate that justified them."""
+
+    def __init__(self, mask_dtype, attention_dtype, estimated_bytes, budget_bytes, dense_attention):
+        self.mask_dtype = mask_dtype
+        self.attention_dtype = attention_dtype
+        self.estimated_bytes = estimated_bytes
+        self.budget_bytes = budget_bytes
+        self.dense_attention = dense_attention
+
+    @property
+    def downgraded(self):
+        return self.mask_dtype != torch.float32 or self.attention_dtype != torch.float32
+
+    def describe(self):
+        mask = str(self.mask_dtype).replace("torch.", "")
+        attention = str(self.attention_dtype).replace("torch.", "")
+        attention = f"dense {attention}" if self.dense_attention else f"compact ({attention} on expansion)"
+        return (f"masks {mask}, attention {attention}, "
+                f"~{_mb(self.estimated_bytes):.1f} MB of {_mb(self.budget_bytes):.0f} MB budget")
+
+
+def estimate_bytes(num_regions, latent_shape, txt_tokens, dense_attention,
+                   mask_dtype=torch.float32, attention_dtype=torch.float32, cond_bytes=0, pyramid=False):
+    """
+    Estimated host bytes for one run.
+
+    txt_tokens holds the text length of each region's conditioning. Compact
+    attention masks only store geometry, so they count as zero here. pyramid
+    adds the downsampled mask levels.
+    """
+    img_tokens = int(latent_shape[0]) * int(latent_shape[1])
+    mask_scale = sum(1.0 / (f * f) for f in PYRAMID_FACTORS) if pyramid else 1.0
+    total = int(cond_bytes) + int(num_regions * img_tokens * _itemsize(mask_dtype) * mask_scale)
+    if dense_attention:
+        total += sum((int(t) + img_tokens) ** 2 for t in txt_tokens) * _itemsize(attention_dtype)
+    return total
+
+
+def plan_memory(num_regions, latent_shape, txt_tokens, dense_attention, cond_bytes=0, budget_bytes=None,
+                pyramid=False):
+    """
+    Pick mask/attention storage that fits the budget, or raise ValueError.
+
+    Tries float32, then HALF_DTYPE for both. Neither mask goes boolean:
+    attention masks are additive (0 / -10000) once ComfyUI casts them to the
+    model dtype, and both get resized with bilinear interpolation, which needs
+    a floating point tensor.
+    """
+    budget_bytes = DEFAULT_BUDGET_BYTES if budget_bytes is None else budget_bytes
+    candidates = [(torch.float32, torch.float32), (HALF_DTYPE, HALF_DTYPE)]
+
+    estimate = None
+    for mask_dtype, attention_dtype in candidates:
+        estimate = estimate_bytes(num_regions, latent_shape, txt_tokens, dense_attention,
+                                  mask_dtype, attention_dtype, cond_bytes, pyramid)
+        if estimate <= budget_bytes:
+            return MemoryPlan(mask_dtype, attention_dtype, estimate, budget_bytes, dense_attention)
+
+    hint = "turn off dense_attention_mask, " if dense_attention else ""
+    raise ValueError(
+        f"EasyRegion needs ~{_mb(estimate):.0f} MB for {num_regions} region masks at latent "
+        f"{latent_shape[1]}x{latent_shape[0]} even at reduced precision, over the "
+        f"{_mb(budget_bytes):.0f} MB budget. Try {hint}fewer regions or a smaller resolution, "
+        f"or raise EASYREGION_MEMORY_BUDGET_MB."
+    )
@@ -0,0 +1,87 @@
+# Node result caching
+# ComfyUI's own cache keys on widget inputs only, but EasyRegion output also
+# depends on the saved workflow properties (boxes, canvas size). Hash the
+# effective inputs instead, for IS_CHANGED and for an in-process result cache.
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from .instrumentation import STATS, logger
+from .layout import resolve_region_values
+
+
+def content_hash(*parts):
+    """Stable hex digest of JSON-able parts (anything else hashes by repr)."""
+    payload = json.dumps(parts, sort_keys=True, default=repr, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Small LRU of node outputs keyed by content hash."""
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            if self.max_entries <= 0:
+                return
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# EASYREGION_RESULT_CACHE_SIZE=0 disables result caching
+RESULT_CACHE = ResultCache(max_entries=int(os.environ.get("EASYREGION_RESULT_CACHE_SIZE", 16)))
+STATS.register_gauge("result_cache", lambda: {
+    "entries": len(RESULT_CACHE), "hits": RESULT_CACHE.hits, "misses": RESULT_CACHE.misses,
+})
+
+
+def region_inputs_hash(node_class, region_boxes, unique_id, width, height, inputs):
+    """
+    IS_CHANGED hash of a box-drawing node: its widget inputs plus its boxes.
+
+    ComfyUI calls IS_CHANGED without extra_pnginfo, so the saved-workflow
+    override isn't visible here - the boxes come from the region_boxes
+    widget, which the frontend rewrites from the node's box properties
+    every time a prompt is queued.
+    """
+    values, canvas_width, canvas_height = resolve_region_values(
+        region_boxes, None, unique_id, node_class.DEFAULT_BOXES, width, height, quiet=True
+    )
+    inputs = {name: value for name, value in inputs.items() if name != "clip"}
+    return content_hash(node_class.__name__, values, canvas_width, canvas_height, width, height, inputs)
+
+
+def cached_result(key):
+    """The cached node output for key, or None. Hits are logged."""
+    result = RESULT_CACHE.get(key)
+    if result is not None:
+        logger.info("ℹ️  EasyRegion inputs unchanged - reusing previous conditioning")
+    return result
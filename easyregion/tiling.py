@@ -0,0 +1,97 @@
+# Tiled conditioning
+# Splits mask-based conditioning into overlapping latent tiles for tiled
+# samplers and very large images. Each tile only carries the regions that
+# reach into it, with masks and attention masks built directly at tile size,
+# so memory follows the tile area instead of the image area.
+
+import torch
+
+from .attention import RegionAttentionMask
+from .masks import RegionMask, RegionMaskStack, mask_pyramid
+
+
+def tile_grid(latent_shape, tile_size, overlap):
+    """
+    Overlapping tiles covering a latent, as (y_start, y_end, x_start, x_end).
+
+    Tiles step by tile_size - overlap; the last tile on each axis is pushed
+    back to end on the latent edge so every tile has the full size (unless
+    the latent itself is smaller).
+    """
+    def starts(length):
+        size = min(tile_size, length)
+        stride = max(1, size - overlap)
+        positions = list(range(0, max(length - size, 0) + 1, stride))
+        if positions[-1] + size < length:
+            positions.append(length - size)
+        return [(p, p + size) for p in positions]
+
+    latent_height, latent_width = int(latent_shape[0]), int(latent_shape[1])
+    return [(y0, y1, x0, x1) for y0, y1 in starts(latent_height) for x0, x1 in starts(latent_width)]
+
+
+def crop_region_mask(mask, tile):
+    """
+    A RegionMask cropped to tile, built at tile size - identical to slicing the
+    full mask, without ever building it. None if no part of the region is in
+    the tile.
+    """
+    y0, y1, x0, x1 = tile
+    stack = mask.stack
+    indices = torch.tensor(mask.indices, dtype=torch.int64)
+    boxes = stack.boxes[indices]
+    inside = (boxes[:, 1] > y0) & (boxes[:, 0] < y1) & (boxes[:, 3] > x0) & (boxes[:, 2] < x1)
+    if not bool(inside.any()):
+        return None
+
+    # Feathering measures from the box edges, so shifting boxes into tile
+    # coordinates (they may start before or end after the tile) keeps the values
+    shifted = boxes[inside] - torch.tensor([y0, y0, x0, x0], dtype=torch.int64)
+    tile_stack = RegionMaskStack(shifted, (y1 - y0, x1 - x0), stack.feather_sizes[indices][inside],
+                                 stack.falloff, stack.dtype)
+    weights = None
+    if mask.weights is not None:
+        weights = [w for w, keep in zip(mask.weights, inside.tolist()) if keep]
+    count = int(inside.sum())
+    return RegionMask(tile_stack, list(range(count)) if count > 1 or weights is not None else 0, weights)
+
+
+def crop_attention_mask(attention_mask, tile):
+    """Tile-local RegionAttentionMask: the region's boxes clipped to tile, in tile coordinates."""
+    y0, y1, x0, x1 = tile
+    boxes = []
+    for ys, ye, xs, xe in attention_mask.boxes:
+        ys, ye, xs, xe = max(ys, y0) - y0, min(ye, y1) - y0, max(xs, x0) - x0, min(xe, x1) - x0
+        if ye > ys and xe > xs:
+            boxes.append((ys, ye, xs, xe))
+    if not boxes:
+        boxes = [(0, 0, 0, 0)]
+    return RegionAttentionMask(attention_mask.txt_tokens, (y1 - y0, x1 - x0), boxes, dtype=attention_mask.dtype)
+
+
+def tile_conditioning(conditioning, tile, pyramid=False):
+    """
+    Conditioning for one tile: unmasked entries (the background) as they are,
+    masked region entries cropped to the tile, regions outside it dropped.
+    """
+    tiled = []
+    for cond, options in conditioning:
+        mask = options.get("mask")
+        if mask is None:
+            tiled.append([cond, options])
+            continue
+        tile_mask = crop_region_mask(mask, tile)
+        if tile_mask is None:
+            continue
+
+        n = [cond, options.copy()]
+        n[1]["mask"] = tile_mask
+        n[1].pop("mask_pyramid", None)
+        if pyramid:
+            n[1]["mask_pyramid"] = mask_pyramid(tile_mask)
+        attention_mask = options.get("attention_mask")
+        if isinstance(attention_mask, RegionAttentionMask):
+            n[1]["attention_mask"] = crop_attention_mask(attention_mask, tile)
+            n[1]["attention_mask_img_shape"] = (tile[1] - tile[0], tile[3] - tile[2])
+        tiled.append(n)
+    return tiled
@@ -3,11 +3,95 @@
 // All-in-one nodes with CLIP input and prompt boxes
 
 import { app } from "/scripts/app.js";
-import {CUSTOM_INT, transformFunc, swapInputs, renameNodeInputs, removeNodeInputs, getDrawColor, computeCanvasSize, calculateDefaultRegions} from "./utils.js"
+import {CUSTOM_INT, transformFunc, swapInputs, renameNodeInputs, removeNodeInputs, getDrawColor, computeCanvasSize, calculateDefaultRegions, getRegionPromptTexts, flushRegionBoxes, scheduleRegionBoxesSync} from "./utils.js"
+
+// Clip a [x, y, w, h] region (output pixels) to the drawn background area
+function getDrawArea(v, width, height, backgroundWidth, backgroundHeight) {
+	let x = v[0]*backgroundWidth/width
+	let y = v[1]*backgroundHeight/height
+	let w = v[2]*backgroundWidth/width
+	let h = v[3]*backgroundHeight/height
+
+	if (x > backgroundWidth) { x = backgroundWidth}
+	if (y > backgroundHeight) { y = backgroundHeight}
+
+	if (x+w > backgroundWidth) {
+		w = Math.max(0, backgroundWidth-x)
+	}
+
+	if (y+h > backgroundHeight) {
+		h = Math.max(0, backgroundHeight-y)
+	}
+
+	return [x, y, w, h]
+}
+
+// Everything under the selected box - border, background, the other regions and
+// the grid - drawn once into an offscreen bitmap at the current zoom
+function renderStaticLayer(layer, values, index, width, height, scale, backgroundWidth, backgroundHeight, border, pixelScale) {
+	const canvasWidth = Math.max(1, Math.ceil((backgroundWidth+border*2)*pixelScale))
+	const canvasHeight = Math.max(1, Math.ceil((backgroundHeight+border*2)*pixelScale))
+	if (!layer.canvas) {
+		layer.canvas = (typeof OffscreenCanvas !== "undefined") ? new OffscreenCanvas(canvasWidth, canvasHeight) : document.createElement("canvas")
+	}
+	// Resizing also clears the bitmap
+	layer.canvas.width = canvasWidth
+	layer.canvas.height = canvasHeight
+
+	const ctx = layer.canvas.getContext("2d")
+	ctx.clearRect(0, 0, canvasWidth, canvasHeight)
+	ctx.setTransform(pixelScale, 0, 0, pixelScale, border*pixelScale, border*pixelScale)
+
+	ctx.fillStyle = "#000000"
+	ctx.fillRect(-border, -border, backgroundWidth+border*2, backgroundHeight+border*2)
+
+	ctx.fillStyle = globalThis.LiteGraph.NODE_DEFAULT_BGCOLOR
+	ctx.fillRect(0, 0, backgroundWidth, backgroundHeight);
+
+	// Draw all the conditioning zones
+	for (const [k, v] of values.entries()) {
+
+		if (k == index) {continue}
+
+		const [x, y, w, h] = getDrawArea(v, width, height, backgroundWidth, backgroundHeight)
+
+		ctx.fillStyle = getDrawColor(k/values.length, "80")
+		ctx.fillRect(x, y, w, h)
+
+		// Add region label
+		ctx.fillStyle = "#ffffff";
+		ctx.font = "bold 14px Arial";
+		ctx.textAlign = "left";
+		ctx.fillText(`Region ${k+1}`, x+5, y+18);
+
+	}
+
+	ctx.beginPath();
+	ctx.lineWidth = 1;
+
+	for (let x = 0; x <= width/64; x += 1) {
+		ctx.moveTo(x*64*scale, 0);
+		ctx.lineTo(x*64*scale, backgroundHeight);
+	}
+
+	for (let y = 0; y <= height/64; y += 1) {
+		ctx.moveTo(0, y*64*scale);
+		ctx.lineTo(backgroundWidth, y*64*scale);
+	}
+
+	ctx.strokeStyle = "#00000050";
+	ctx.stroke();
+	ctx.closePath();
+}
 
 // Shared canvas function for both enhanced nodes
 function addEasyRegionCanvas(node, app) {
 
+	// Cached static layer and what it was drawn from. Editing the selected box
+	// keeps it valid; selecting another region, replacing/resizing the values
+	// array, resizing the canvas or zooming redraws it
+	const layer = { canvas: null, key: null }
+
 	const widget = {
 		type: "customCanvas",
 		name: "EasyRegion-Canvas",
@@ -32,15 +116,9 @@ function addEasyRegionCanvas(node, app) {
 
 			const scale = Math.min((widgetWidth-margin*2)/width, (widgetHeight-margin*2)/height)
 
-			// Find index widget (it's after CLIP and prompt inputs)
-			let indexWidget = null;
-			for (let i = 0; i < node.widgets.length; i++) {
-				if (node.widgets[i].name === "index") {
-					indexWidget = node.widgets[i];
-					break;
-				}
-			}
-			const index = indexWidget ? Math.round(indexWidget.value) : 0;
+			// Selected region (the 1-based "region" selector widget)
+			const regionSelector = node.widgets[node.index];
+			const index = regionSelector ? Math.max(0, Math.round(regionSelector.value) - 1) : 0;
 
 			let backgroundWidth = width * scale
 			let backgroundHeight = height * scale
@@ -57,70 +135,23 @@ function addEasyRegionCanvas(node, app) {
 			let widgetX = xOffset
 			widgetY = widgetY + yOffset
 
-			ctx.fillStyle = "#000000"
-			ctx.fillRect(widgetX-border, widgetY-border, backgroundWidth+border*2, backgroundHeight+border*2)
-
-			ctx.fillStyle = globalThis.LiteGraph.NODE_DEFAULT_BGCOLOR
-			ctx.fillRect(widgetX, widgetY, backgroundWidth, backgroundHeight);
-
-			function getDrawArea(v) {
-				let x = v[0]*backgroundWidth/width
-				let y = v[1]*backgroundHeight/height
-				let w = v[2]*backgroundWidth/width
-				let h = v[3]*backgroundHeight/height
-
-				if (x > backgroundWidth) { x = backgroundWidth}
-				if (y > backgroundHeight) { y = backgroundHeight}
-
-				if (x+w > backgroundWidth) {
-					w = Math.max(0, backgroundWidth-x)
-				}
-
-				if (y+h > backgroundHeight) {
-					h = Math.max(0, backgroundHeight-y)
-				}
-
-				return [x, y, w, h]
-			}
-
-			// Draw all the conditioning zones
-			for (const [k, v] of values.entries()) {
-
-				if (k == index) {continue}
-
-				const [x, y, w, h] = getDrawArea(v)
-
-				ctx.fillStyle = getDrawColor(k/values.length, "80")
-				ctx.fillRect(widgetX+x, widgetY+y, w, h)
-
-				// Add region label
-				ctx.fillStyle = "#ffffff";
-				ctx.font = "bold 14px Arial";
-				ctx.textAlign = "left";
-				ctx.fillText(`Region ${k+1}`, widgetX+x+5, widgetY+y+18);
-
+			// Render the bitmap at the canvas zoom (in quarter steps, so zooming
+			// doesn't redraw it every frame) to keep it sharp
+			const transform = ctx.getTransform ? ctx.getTransform() : null
+			const zoom = transform ? Math.hypot(transform.a, transform.b) : 1
+			const pixelScale = Math.min(4, Math.ceil(zoom * (globalThis.devicePixelRatio || 1) * 4) / 4)
+
+			const key = [values, values.length, index, width, height, backgroundWidth, backgroundHeight, pixelScale,
+				globalThis.LiteGraph.NODE_DEFAULT_BGCOLOR]
+			if (!layer.key || key.some((v, i) => v !== layer.key[i])) {
+				renderStaticLayer(layer, values, index, width, height, scale, backgroundWidth, backgroundHeight, border, pixelScale)
+				layer.key = key
 			}
-
-			ctx.beginPath();
-			ctx.lineWidth = 1;
-
-			for (let x = 0; x <= width/64; x += 1) {
-				ctx.moveTo(widgetX+x*64*scale, widgetY);
-				ctx.lineTo(widgetX+x*64*scale, widgetY+backgroundHeight);
-			}
-
-			for (let y = 0; y <= height/64; y += 1) {
-				ctx.moveTo(widgetX, widgetY+y*64*scale);
-				ctx.lineTo(widgetX+backgroundWidth, widgetY+y*64*scale);
-			}
-
-			ctx.strokeStyle = "#00000050";
-			ctx.stroke();
-			ctx.closePath();
+			ctx.drawImage(layer.canvas, widgetX-border, widgetY-border, layer.canvas.width/pixelScale, layer.canvas.height/pixelScale)
 
 			// Draw currently selected zone (if values exist)
 			if (values.length > 0 && index < values.length) {
-				let [x, y, w, h] = getDrawArea(values[index])
+				let [x, y, w, h] = getDrawArea(values[index], width, height, backgroundWidth, backgroundHeight)
 
 				w = Math.max(32*scale, w)
 				h = Math.max(32*scale, h)
@@ -190,6 +221,8 @@ app.registerExtension({
 				const boxWidget = this.widgets[this.widgets.length - 1];
 				boxWidget.type = "converted-widget";
 				boxWidget.hidden = true;
+				// Queueing a prompt must not see boxes from before a pending sync
+				boxWidget.serializeValue = () => flushRegionBoxes(this);
 
 				// Add canvas after the prompt inputs
 				addEasyRegionCanvas(this, app)
@@ -233,10 +266,7 @@ app.registerExtension({
 					node.properties["values"] = newValues.filter(v => v !== null);
 
 					// Update hidden widget
-					const boxWidget = node.widgets.find(w => w.name === "region_boxes");
-					if (boxWidget) {
-						boxWidget.value = JSON.stringify(node.properties["values"]);
-					}
+					scheduleRegionBoxesSync(node);
 
 					// Update region selector max
 					const regionSelector = node.widgets[node.index];
@@ -340,7 +370,7 @@ app.registerExtension({
 app.registerExtension({
 	name: "Comfy.EasyRegion.Mask",
 	async beforeRegisterNodeDef(nodeType, nodeData, app) {
-		if (nodeData.name === "EasyRegionMask") {
+		if (nodeData.name === "EasyRegionMask" || nodeData.name === "EasyRegionMaskDynamic" || nodeData.name === "EasyRegionMaskTiled" || nodeData.name === "EasyRegionMaskMultiRes") {
 			const onNodeCreated = nodeType.prototype.onNodeCreated;
 			nodeType.prototype.onNodeCreated = function () {
 				const r = onNodeCreated ? onNodeCreated.apply(this, arguments) : undefined;
@@ -366,6 +396,8 @@ app.registerExtension({
 				const boxWidget = this.widgets[this.widgets.length - 1];
 				boxWidget.type = "converted-widget";
 				boxWidget.hidden = true;
+				// Queueing a prompt must not see boxes from before a pending sync
+				boxWidget.serializeValue = () => flushRegionBoxes(this);
 
 				// Add canvas after the prompt inputs
 				addEasyRegionCanvas(this, app)
@@ -377,42 +409,36 @@ app.registerExtension({
 					const defaultHeight = node.properties["height"] || (node.type === "EasyRegionMask" ? 1024 : 512);
 					const currentValues = node.properties["values"] || [];
 
-					// Check which region prompts have content
-					const regionPrompts = [
-						node.widgets.find(w => w.name === "region1_prompt"),
-						node.widgets.find(w => w.name === "region2_prompt"),
-						node.widgets.find(w => w.name === "region3_prompt"),
-						node.widgets.find(w => w.name === "region4_prompt")
-					];
+					// Check which region prompts have content (region1-4 inputs, or one per line on the dynamic node)
+					const regionPrompts = getRegionPromptTexts(node);
 
-					const newValues = [];
+					// Box N always belongs to prompt N (Python reads values[N-1] for region N),
+					// so a blank prompt before a filled one keeps its box as a placeholder -
+					// it's ignored until the prompt gets text. Only trailing blanks lose their box
+					let regionCount = 0;
 					for (let i = 0; i < regionPrompts.length; i++) {
-						const prompt = regionPrompts[i]?.value || "";
-						if (prompt.trim()) {
-							// Region has content - ensure it has a box
-							if (currentValues[i]) {
-								// Keep existing box
-								newValues.push(currentValues[i]);
-							} else {
-								// Create new box with percentage-based defaults
-								const allRegions = calculateDefaultRegions(defaultWidth, defaultHeight);
-								const defaultBox = allRegions[Math.min(i, allRegions.length - 1)];
-								newValues.push(defaultBox);
-							}
+						if ((regionPrompts[i] || "").trim()) {
+							regionCount = i + 1;
+						}
+					}
+
+					const newValues = [];
+					for (let i = 0; i < regionCount; i++) {
+						if (currentValues[i]) {
+							// Keep existing box
+							newValues.push(currentValues[i]);
 						} else {
-							// Region is empty - don't include box
-							newValues.push(null);
+							// Create new box with percentage-based defaults
+							const allRegions = calculateDefaultRegions(defaultWidth, defaultHeight);
+							const defaultBox = allRegions[Math.min(i, allRegions.length - 1)];
+							newValues.push(defaultBox);
 						}
 					}
 
-					// Remove null entries and update
-					node.properties["values"] = newValues.filter(v => v !== null);
+					node.properties["values"] = newValues;
 
 					// Update hidden widget
-					const boxWidget = node.widgets.find(w => w.name === "region_boxes");
-					if (boxWidget) {
-						boxWidget.value = JSON.stringify(node.properties["values"]);
-					}
+					scheduleRegionBoxesSync(node);
 
 					// Update region selector max
 					const regionSelector = node.widgets[node.index];
@@ -436,7 +462,8 @@ app.registerExtension({
 				"region1_prompt": "📍 Region 1:",
 				"region2_prompt": "📍 Region 2:",
 				"region3_prompt": "📍 Region 3:",
-				"region4_prompt": "📍 Region 4:"
+				"region4_prompt": "📍 Region 4:",
+				"region_prompts": "📍 Regions (one per line):"
 			};
 			for (const w of this.widgets) {
 				if (w.name in promptLabels) {
@@ -541,10 +568,7 @@ app.registerExtension({
 							node.properties["values"] = scaledValues;
 
 							// Update hidden region_boxes widget
-							const boxWidget = node.widgets.find(w => w.name === "region_boxes");
-							if (boxWidget) {
-								boxWidget.value = JSON.stringify(scaledValues);
-							}
+							scheduleRegionBoxesSync(node);
 
 							// Update the box widgets to show new values
 							const regionSelectorValue = node.widgets[node.index]?.value || 1;
@@ -593,10 +617,7 @@ app.registerExtension({
 							node.properties["values"] = scaledValues;
 
 							// Update hidden region_boxes widget
-							const boxWidget = node.widgets.find(w => w.name === "region_boxes");
-							if (boxWidget) {
-								boxWidget.value = JSON.stringify(scaledValues);
-							}
+							scheduleRegionBoxesSync(node);
 
 							// Update the box widgets to show new values
 							const regionSelectorValue = node.widgets[node.index]?.value || 1;
@@ -626,7 +647,7 @@ app.registerExtension({
 		}
 	},
 	loadedGraphNode(node, _) {
-		if (node.type === "EasyRegionMask") {
+		if (node.type === "EasyRegionMask" || node.type === "EasyRegionMaskDynamic" || node.type === "EasyRegionMaskTiled" || node.type === "EasyRegionMaskMultiRes") {
 			node.widgets[node.index].options["max"] = node.properties["values"].length-1
 
 			// Sync canvas properties with widget values on load
@@ -49,11 +49,46 @@ export function transformFunc(widget, value, node, index) {
 		node.widgets_values[2] = node.properties["values"].join()
 	}
 
-	// Update hidden region_boxes widget with current values
+	// Hidden region_boxes widget is re-serialized at most once per frame while dragging
+	scheduleRegionBoxesSync(node)
+}
+
+/**
+ * Write node.properties["values"] to the hidden region_boxes widget now
+ * (cancels a pending scheduled sync)
+ * @param {object} node - EasyRegion node
+ * @returns {string} The serialized boxes
+ */
+export function flushRegionBoxes(node) {
+	if (node.regionBoxesFrame) {
+		cancelAnimationFrame(node.regionBoxesFrame);
+		node.regionBoxesFrame = null;
+	}
+	const serialized = JSON.stringify(node.properties["values"] || []);
 	const boxWidget = node.widgets.find(w => w.name === "region_boxes");
 	if (boxWidget) {
-		boxWidget.value = JSON.stringify(node.properties["values"]);
+		boxWidget.value = serialized;
 	}
+	return serialized;
+}
+
+/**
+ * Sync the hidden region_boxes widget on the next animation frame. Repeated
+ * calls within a frame (e.g. every step of a drag) coalesce into one
+ * JSON.stringify; flushRegionBoxes forces it early (before queueing a prompt)
+ * @param {object} node - EasyRegion node
+ */
+export function scheduleRegionBoxesSync(node) {
+	if (node.regionBoxesFrame) return;
+	if (typeof requestAnimationFrame === "undefined") {
+		flushRegionBoxes(node);
+		return;
+	}
+	node.regionBoxesFrame = requestAnimationFrame(() => {
+		node.regionBoxesFrame = null;
+		flushRegionBoxes(node);
+		node.setDirtyCanvas?.(true, false);
+	});
 }
 
 export function swapInputs(node, indexA, indexB) {
@@ -169,6 +204,20 @@ export function calculateDefaultRegions(width, height) {
 	];
 }
 
+/**
+ * Get the region prompt texts of an EasyRegion node, in region order
+ * Dynamic nodes use one prompt per line of "region_prompts", others region1-4_prompt
+ * @param {object} node - EasyRegion node
+ * @returns {Array} Array of prompt strings (may contain empty strings)
+ */
+export function getRegionPromptTexts(node) {
+	const linesWidget = node.widgets.find(w => w.name === "region_prompts");
+	if (linesWidget) {
+		return (linesWidget.value || "").split(/\r\n|\r|\n/);
+	}
+	return [1, 2, 3, 4].map(i => node.widgets.find(w => w.name === `region${i}_prompt`)?.value || "");
+}
+
 export function computeCanvasSize(node, size) {
 	if (!node.widgets || node.widgets.length === 0 || node.widgets[0].last_y == null) return;
 
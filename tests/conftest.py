@@ -0,0 +1,36 @@
+# The easyregion helpers are pure torch, so the tests import them as a
+# top-level package (like `python -m easyregion.cli`). pytest also imports the
+# node package's __init__ (the repo root is a package), which needs ComfyUI's
+# nodes/folder_paths - minimal shims stand in for them, as in benchmarks/stubs.py
+import importlib
+import importlib.util
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PACKAGE_NAME = "ComfyUI_EasyRegion"
+
+sys.path.insert(0, str(REPO_ROOT))
+
+if "nodes" not in sys.modules:
+    nodes = types.ModuleType("nodes")
+    nodes.MAX_RESOLUTION = 16384
+    sys.modules["nodes"] = nodes
+if "folder_paths" not in sys.modules:
+    sys.modules["folder_paths"] = types.ModuleType("folder_paths")
+
+
+@pytest.fixture(scope="session")
+def regional_prompting():
+    """The node module, imported under the package name ComfyUI gives a custom node checkout."""
+    if PACKAGE_NAME not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            PACKAGE_NAME, REPO_ROOT / "__init__.py", submodule_search_locations=[str(REPO_ROOT)]
+        )
+        package = importlib.util.module_from_spec(spec)
+        sys.modules[PACKAGE_NAME] = package
+        spec.loader.exec_module(package)
+    return importlib.import_module(f"{PACKAGE_NAME}.RegionalPrompting")
@@ -0,0 +1,93 @@
+# RegionAttentionMask must expand to exactly the dense mask EasyRegionMask
+# used to build per region (0.0 = attend, -10000.0 = blocked)
+
+import pytest
+import torch
+
+from easyregion.attention import ATTENTION_BLOCKED, RegionAttentionMask
+
+
+def legacy_dense_mask(txt_tokens, latent_height, latent_width, box):
+    """The pre-compact dense builder, verbatim apart from taking the box as an argument."""
+    y_latent, y_end, x_latent, x_end = box
+    img_tokens = latent_height * latent_width
+    total_tokens = txt_tokens + img_tokens
+
+    attention_mask = torch.full((1, total_tokens, total_tokens), -10000.0, dtype=torch.float32)
+    attention_mask[0, :txt_tokens, :txt_tokens] = 0.0
+
+    y_coords = torch.arange(y_latent, y_end, dtype=torch.long)
+    x_coords = torch.arange(x_latent, x_end, dtype=torch.long)
+    y_grid, x_grid = torch.meshgrid(y_coords, x_coords, indexing='ij')
+    img_token_indices = txt_tokens + (y_grid.flatten() * latent_width + x_grid.flatten())
+
+    attention_mask[0, :txt_tokens, img_token_indices] = 0.0
+    attention_mask[0, img_token_indices, :txt_tokens] = 0.0
+    img_idx_row = img_token_indices.unsqueeze(1)
+    img_idx_col = img_token_indices.unsqueeze(0)
+    attention_mask[0, img_idx_row, img_idx_col] = 0.0
+    return attention_mask
+
+
+def random_boxes(count, latent_height, latent_width, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    boxes = []
+    for _ in range(count):
+        y0, y1 = sorted(torch.randint(0, latent_height + 1, (2,), generator=generator).tolist())
+        x0, x1 = sorted(torch.randint(0, latent_width + 1, (2,), generator=generator).tolist())
+        boxes.append((y0, y1, x0, x1))
+    return boxes
+
+
+LATENT = (12, 20)
+TXT_TOKENS = 7
+# Clipped to the latent edges, single row/column, empty, and the whole latent
+EDGE_BOXES = [(0, 12, 15, 20), (11, 12, 0, 20), (0, 12, 19, 20), (3, 3, 4, 9), (5, 9, 6, 6), (0, 12, 0, 20)]
+BOXES = EDGE_BOXES + random_boxes(10, *LATENT)
+
+
+@pytest.mark.parametrize("box", BOXES)
+def test_to_dense_matches_legacy(box):
+    expected = legacy_dense_mask(TXT_TOKENS, *LATENT, box)
+    mask = RegionAttentionMask(TXT_TOKENS, LATENT, box)
+    assert mask.shape == expected.shape
+    assert torch.equal(mask.to_dense(), expected)
+    assert torch.equal(mask.to("cpu"), expected)
+
+
+@pytest.mark.parametrize("box", BOXES)
+def test_upscale_dit_mask_quadrants(box):
+    # upscale_dit_mask reads the text/image quadrants separately
+    expected = legacy_dense_mask(TXT_TOKENS, *LATENT, box)
+    mask = RegionAttentionMask(TXT_TOKENS, LATENT, box)
+    for rows in (slice(None, TXT_TOKENS), slice(TXT_TOKENS, None)):
+        for cols in (slice(None, TXT_TOKENS), slice(TXT_TOKENS, None)):
+            assert torch.equal(mask[:, rows, cols], expected[:, rows, cols])
+    assert torch.equal(mask[0, 3], expected[0, 3])
+    assert torch.equal(mask[0, :, -1], expected[0, :, -1])
+
+
+@pytest.mark.parametrize("dtype", [torch.float16, torch.bfloat16, torch.float64])
+@pytest.mark.parametrize("box", BOXES[:8])
+def test_dtype_casts_match_legacy(box, dtype):
+    expected = legacy_dense_mask(TXT_TOKENS, *LATENT, box).to(dtype)
+    mask = RegionAttentionMask(TXT_TOKENS, LATENT, box)
+    assert torch.equal(mask.to(dtype), expected)
+    assert torch.equal(mask.to(device="cpu", dtype=dtype), expected)
+    assert torch.equal(RegionAttentionMask(TXT_TOKENS, LATENT, box, dtype=dtype).to_dense(), expected)
+
+
+def test_torch_functions_expand():
+    box = BOXES[7]
+    expected = legacy_dense_mask(TXT_TOKENS, *LATENT, box)
+    mask = RegionAttentionMask(TXT_TOKENS, LATENT, box)
+    assert torch.equal(torch.cat([mask, mask]), torch.cat([expected, expected]))
+    assert torch.equal(mask.repeat(2, 1, 1), expected.repeat(2, 1, 1))
+    assert set(mask.to_dense().unique().tolist()) <= {0.0, ATTENTION_BLOCKED}
+
+
+def test_bool_cast_matches_legacy():
+    # A cast stays a cast of the additive mask - never "True = attend"
+    box = BOXES[7]
+    expected = legacy_dense_mask(TXT_TOKENS, *LATENT, box).to(torch.bool)
+    assert torch.equal(RegionAttentionMask(TXT_TOKENS, LATENT, box).to(torch.bool), expected)
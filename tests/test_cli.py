@@ -0,0 +1,25 @@
+# The mask-building CLI stops at a bad line with a one-line error, keeping what it wrote
+
+import os
+
+import pytest
+
+from easyregion import cli
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_bad_line_exits_nonzero(tmp_path, caplog, workers):
+    layouts = tmp_path / "layouts.jsonl"
+    layouts.write_text(
+        '{"boxes": [[0, 0, 64, 64]], "prompts": ["a"]}\n'
+        '{"boxes": [[0, 0, 64, 64]], "prompts": ["b"]}\n'
+        'not json\n'
+        '{"boxes": [], "prompts": []}\n'
+    )
+    output = tmp_path / "masks"
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main([str(layouts), "--width", "128", "--height", "128", "--output", str(output),
+                  "--format", "pt", "--workers", str(workers)])
+    assert exit_info.value.code == 1
+    assert sorted(os.listdir(output)) == ["00000001.pt", "00000002.pt"]
+    assert "line 3" in caplog.text and "wrote masks for 2 layouts" in caplog.text
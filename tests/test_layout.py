@@ -0,0 +1,85 @@
+# Layout parsing: bad layouts raise ValueError naming the layout
+
+import pytest
+
+from easyregion.headless import resolve_layout
+from easyregion.layout import (
+    find_workflow_node, normalize_layout, parse_layouts, parse_strengths, region_area_array, region_box_array,
+    resolve_region_values,
+)
+
+
+def test_strengths_forms():
+    prompts = ["a", "b", "c"]
+    assert normalize_layout({"prompts": prompts, "strengths": 0.5}, 1, 64, 64)["region_strengths"] == [0.5] * 3
+    assert normalize_layout({"prompts": prompts, "strengths": "1, 2"}, 1, 64, 64)["region_strengths"] == [1.0, 2.0, 2.0]
+    assert normalize_layout({"prompts": prompts, "strengths": [3, "4"]}, 1, 64, 64)["region_strengths"] == [3.0, 4.0, 4.0]
+    assert normalize_layout({"prompts": prompts}, 1, 64, 64)["region_strengths"] == [1.0] * 3
+
+
+@pytest.mark.parametrize("layout, field", [
+    ({"prompts": ["a"], "strengths": ["x"]}, "strengths"),
+    ({"prompts": ["a"], "strengths": [None]}, "strengths"),
+    ({"prompts": ["a"], "strengths": [float("nan")]}, "strengths"),
+    ({"prompts": ["a"], "strengths": float("inf")}, "strengths"),
+    ({"prompts": ["a"], "strengths": {"a": 1}}, "strengths"),
+    ({"prompts": ["a"], "strengths": True}, "strengths"),
+    ({"prompts": ["a"], "canvas_width": "wide"}, "canvas_width"),
+    ({"prompts": ["a"], "canvas_width": 0}, "canvas_width"),
+    ({"prompts": ["a"], "canvas_width": -512}, "canvas_width"),
+    ({"prompts": ["a"], "canvas_height": 0}, "canvas_height"),
+    ({"boxes": {}, "prompts": ["a"]}, "boxes"),
+    ("not a layout", "expected an object"),
+])
+def test_bad_layouts_name_the_layout(layout, field):
+    with pytest.raises(ValueError, match=f"Layout 2: .*{field}"):
+        normalize_layout(layout, 2, 64, 64)
+
+
+def test_non_finite_strengths_are_invalid():
+    assert parse_strengths("0.5, nan, inf, -inf, 2", 5) == ([0.5, 2.0, 2.0, 2.0, 2.0], ["nan", "inf", "-inf"])
+    assert parse_strengths("nan", 2, default=1.5) == ([1.5, 1.5], ["nan"])
+
+
+def test_parse_layouts_reports_index():
+    text = '{"prompts": ["a"]}\n{"prompts": ["b"], "strengths": 0.5}\n{"prompts": ["c"], "strengths": ["x"]}'
+    with pytest.raises(ValueError, match="Layout 3: 'strengths'"):
+        parse_layouts(text, 64, 64)
+
+
+def test_region_area_array_validates_rows():
+    values = [[0, 0, 10, 10], ["8", "16", 32, 40, "1.5"], [1.5, 2, 3], None, [1, 2, "x", 4], [64, 64, 128, 128, "y"]]
+    boxes, valid = region_box_array(values)
+    assert valid.tolist() == [True, True, False, False, False, True]
+    assert boxes[1].tolist() == [8, 16, 32, 40] and boxes[2].tolist() == [0, 0, 0, 0]
+
+    boxes, strengths, valid = region_area_array(values, default_strength=2.0)
+    assert valid.tolist() == [True, True, False, False, False, False]
+    assert strengths[:2].tolist() == [2.0, 1.5]
+
+    _, _, valid = region_area_array([[0, 0, 8, 8, float("nan")], [0, 0, 8, 8, "inf"], [float("inf"), 0, 8, 8]],
+                                    default_strength=1.0)
+    assert valid.tolist() == [False, False, False]
+
+
+def test_in_place_box_edits_are_seen():
+    layout = normalize_layout({"boxes": [[0, 0, 256, 256]], "prompts": ["a"]}, 1, 512, 512)
+    assert resolve_layout(layout, 512, 512)["pixel_boxes"].tolist() == [[0, 0, 256, 256]]
+    layout["values"][0][0] = 128
+    assert resolve_layout(layout, 512, 512)["pixel_boxes"].tolist() == [[128, 0, 256, 256]]
+
+
+def test_workflow_index_follows_in_place_edits():
+    workflow = {"nodes": [{"id": 3, "properties": {"values": [[1, 2, 3, 4]], "width": 800}},
+                          {"id": 7, "properties": {}}, {"id": 3, "properties": {}}]}
+    assert find_workflow_node(workflow, 3) is workflow["nodes"][0]  # first match, like a scan
+    assert find_workflow_node(workflow, 9) is None
+
+    workflow["nodes"].insert(0, {"id": 9, "properties": {"values": [[5, 6, 7, 8]]}})
+    assert find_workflow_node(workflow, 9) is workflow["nodes"][0]
+    assert find_workflow_node(workflow, 3) is workflow["nodes"][1]
+    workflow["nodes"] = [{"id": 3, "properties": {"values": [[9, 9, 9, 9]]}}]
+    values, canvas_width, _ = resolve_region_values("", {"workflow": workflow}, "3", [], 512, 512, quiet=True)
+    assert values == [[9, 9, 9, 9]] and canvas_width == 512
+    workflow["nodes"][0]["properties"]["values"][0][0] = 1
+    assert resolve_region_values("", {"workflow": workflow}, "3", [], 512, 512, quiet=True)[0] == [[1, 9, 9, 9]]
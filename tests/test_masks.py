@@ -0,0 +1,110 @@
+# The broadcast mask build must match the original per-box feather loop, and
+# every mask_pyramid level must equal what on-the-fly interpolation of the
+# region mask gives a sampler-side attention patch at that resolution
+
+import pytest
+import torch
+
+from easyregion import masks as masks_module
+from easyregion.masks import (
+    FEATHER_FALLOFFS, PYRAMID_FACTORS, RegionMaskStack, apply_falloff, build_region_masks, clear_mask_cache,
+    mask_for_size, mask_pyramid, pyramid_size, region_masks,
+)
+
+# Odd latent sizes exercise the rounded-up pyramid levels
+LATENT = (96, 167)
+BOXES = [[40, 96, 0, 46], [8, 96, 56, 104], [0, 32, 118, 167], [2, 27, 5, 30]]
+
+
+def feather_loop(box, latent_shape, feather_size, falloff):
+    """The per-box, per-edge loop the nodes used before masks were built in one pass."""
+    y_latent, y_end, x_latent, x_end = box
+    mask = torch.zeros((1,) + latent_shape, dtype=torch.float32)
+    mask[0, y_latent:y_end, x_latent:x_end] = 1.0
+    for edge_idx in range(feather_size):
+        fade = float(apply_falloff(torch.tensor((edge_idx + 1) / feather_size, dtype=torch.float64), falloff))
+        if y_latent + edge_idx < y_end:
+            mask[0, y_latent + edge_idx, x_latent:x_end] = fade
+        if y_end - 1 - edge_idx >= y_latent:
+            mask[0, y_end - 1 - edge_idx, x_latent:x_end] = fade
+        if x_latent + edge_idx < x_end:
+            mask[0, y_latent:y_end, x_latent + edge_idx] = torch.minimum(
+                mask[0, y_latent:y_end, x_latent + edge_idx], torch.tensor(fade))
+        if x_end - 1 - edge_idx >= x_latent:
+            mask[0, y_latent:y_end, x_end - 1 - edge_idx] = torch.minimum(
+                mask[0, y_latent:y_end, x_end - 1 - edge_idx], torch.tensor(fade))
+    return mask
+
+
+def on_the_fly(mask, size):
+    """What an attention patch does each step without the pyramid."""
+    return torch.nn.functional.interpolate(mask.unsqueeze(1), size=size, mode="bilinear",
+                                           align_corners=False).squeeze(1)
+
+
+@pytest.mark.parametrize("falloff", FEATHER_FALLOFFS)
+def test_broadcast_build_matches_feather_loop(falloff):
+    # Last box is clipped so small that one row sits in both the top and bottom band
+    boxes = BOXES + [[94, 96, 160, 167]]
+    feather_sizes = [6, 4, 0, 6, 2]
+    built = build_region_masks(boxes, LATENT, torch.tensor(feather_sizes), falloff)
+    for index, (box, feather_size) in enumerate(zip(boxes, feather_sizes)):
+        assert torch.equal(built[index:index + 1], feather_loop(box, LATENT, feather_size, falloff))
+
+
+def test_memo_stays_within_byte_budget(monkeypatch):
+    clear_mask_cache()
+    stack_bytes = len(BOXES) * LATENT[0] * LATENT[1] * 4
+    monkeypatch.setattr(masks_module, "_MASK_CACHE_BYTES", 2 * stack_bytes)
+    for feather in range(4):
+        region_masks(BOXES, LATENT, feather)
+    assert len(masks_module._mask_cache) == 2
+    assert masks_module._mask_cache_bytes == 2 * stack_bytes
+    # The most recent stacks are the ones kept
+    first = region_masks(BOXES, LATENT, 3)
+    assert region_masks(BOXES, LATENT, 3) is first
+
+    # A stack over the whole budget is built but not kept
+    monkeypatch.setattr(masks_module, "_MASK_CACHE_BYTES", stack_bytes - 1)
+    clear_mask_cache()
+    region_masks(BOXES, LATENT, 6)
+    assert len(masks_module._mask_cache) == 0
+    assert masks_module._mask_cache_bytes == 0
+
+
+@pytest.mark.parametrize("falloff", FEATHER_FALLOFFS)
+@pytest.mark.parametrize("feather", [0, 6])
+def test_levels_match_interpolation(falloff, feather):
+    stack = RegionMaskStack(BOXES, LATENT, feather, falloff)
+    for index in range(len(BOXES)):
+        mask = stack.region(index)
+        pyramid = mask_pyramid(mask)
+        assert set(pyramid) == {pyramid_size(LATENT, f) for f in PYRAMID_FACTORS}
+        dense = mask.to("cpu")
+        for size, level in pyramid.items():
+            assert torch.equal(level.to("cpu"), on_the_fly(dense, size))
+            assert torch.equal(mask_for_size({"mask": mask, "mask_pyramid": pyramid}, size).to("cpu"),
+                               on_the_fly(dense, size))
+
+
+def test_merged_region_levels_match_interpolation():
+    # Regions sharing a prompt: weighted union of their masks
+    mask = RegionMaskStack(BOXES, LATENT, 6).region([0, 3], weights=[1.0, 0.5])
+    dense = mask.to("cpu")
+    for size, level in mask_pyramid(mask).items():
+        assert torch.equal(level.to("cpu"), on_the_fly(dense, size))
+
+
+@pytest.mark.parametrize("dtype", [torch.float16, torch.bfloat16])
+def test_half_precision_levels_resize_in_float32(dtype):
+    mask = RegionMaskStack(BOXES, LATENT, 6, dtype=dtype).region(1)
+    dense = mask.to("cpu")
+    assert dense.dtype == dtype
+    for size, level in mask_pyramid(mask).items():
+        assert torch.equal(level.to("cpu"), on_the_fly(dense.float(), size).to(dtype))
+
+
+def test_without_pyramid_resizes_on_the_fly():
+    mask = RegionMaskStack(BOXES, LATENT, 6).region(2).to("cpu")
+    size = pyramid_size(LATENT, 4)
+    assert torch.equal(mask_for_size({"mask": mask}, size), on_the_fly(mask, size))
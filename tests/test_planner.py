@@ -0,0 +1,38 @@
+# The memory planner may lower precision but must keep every mask floating
+# point: dense attention masks are additive and both masks get interpolated
+
+import pytest
+import torch
+
+from easyregion.planner import HALF_DTYPE, estimate_bytes, plan_memory
+
+LATENT = (96, 168)
+TXT_TOKENS = [256, 256]
+
+
+def test_float32_when_it_fits():
+    plan = plan_memory(2, LATENT, TXT_TOKENS, True, budget_bytes=1 << 40)
+    assert (plan.mask_dtype, plan.attention_dtype) == (torch.float32, torch.float32)
+    assert not plan.downgraded
+
+
+def test_half_precision_fallback():
+    half = estimate_bytes(2, LATENT, TXT_TOKENS, True, HALF_DTYPE, HALF_DTYPE)
+    plan = plan_memory(2, LATENT, TXT_TOKENS, True, budget_bytes=half)
+    assert (plan.mask_dtype, plan.attention_dtype) == (HALF_DTYPE, HALF_DTYPE)
+    assert plan.downgraded
+
+
+def test_never_boolean_dense_attention():
+    # Fits as booleans but not at half precision: must fail instead of storing
+    # a 1/0 mask that blocks nothing once cast to the model dtype
+    boolean = estimate_bytes(2, LATENT, TXT_TOKENS, True, HALF_DTYPE, torch.bool)
+    with pytest.raises(ValueError, match="EASYREGION_MEMORY_BUDGET_MB"):
+        plan_memory(2, LATENT, TXT_TOKENS, True, budget_bytes=boolean)
+
+
+def test_compact_attention_costs_nothing():
+    dense = estimate_bytes(2, LATENT, TXT_TOKENS, True)
+    compact = estimate_bytes(2, LATENT, TXT_TOKENS, False)
+    assert compact == 2 * LATENT[0] * LATENT[1] * 4
+    assert dense > compact
@@ -0,0 +1,94 @@
+# Tiled conditioning must carry, for every tile, exactly the matching slice of
+# the full-image masks - built at tile size, never from the full image
+
+import json
+
+import pytest
+import torch
+
+from easyregion.masks import mask_pyramid
+from easyregion.tiling import tile_grid
+
+# Odd-sized latents (1000x840 -> 125x105) give pushed-back edge tiles
+WIDTH, HEIGHT = 1000, 840
+BOXES = [[0, 420, 333, 280], [333, 105, 333, 630], [666, 0, 333, 168], [50, 42, 166, 140]]
+PROMPTS = {"region1_prompt": "red sports car", "region2_prompt": "giraffe wearing sunglasses",
+           "region3_prompt": "blue bird flying", "region4_prompt": "red sports car"}
+
+
+class TinyCLIP:
+    """Deterministic tokenize/encode_from_tokens stand-in - one token per word."""
+
+    def tokenize(self, text):
+        return [sum(map(ord, word)) % 97 for word in text.split()]
+
+    def encode_from_tokens(self, tokens, return_pooled=False):
+        cond = torch.tensor(tokens, dtype=torch.float32)[None, :, None].expand(1, len(tokens), 8).clone()
+        return (cond, cond[:, -1]) if return_pooled else cond
+
+
+@pytest.mark.parametrize("latent_shape, tile_size, overlap", [
+    ((105, 125), 64, 16), ((128, 128), 64, 0), ((40, 200), 64, 8), ((64, 64), 64, 16),
+])
+def test_tile_grid_covers_latent(latent_shape, tile_size, overlap):
+    tiles = tile_grid(latent_shape, tile_size, overlap)
+    covered = torch.zeros(latent_shape, dtype=torch.bool)
+    for y0, y1, x0, x1 in tiles:
+        assert 0 <= y0 < y1 <= latent_shape[0] and 0 <= x0 < x1 <= latent_shape[1]
+        # Full-size tiles, unless the latent is smaller than a tile
+        assert (y1 - y0, x1 - x0) == (min(tile_size, latent_shape[0]), min(tile_size, latent_shape[1]))
+        covered[y0:y1, x0:x1] = True
+    assert bool(covered.all())
+
+    # Neighbours overlap by at least overlap (the last, pushed-back tile by more)
+    for axis in (0, 2):
+        starts = sorted({tile[axis] for tile in tiles})
+        ends = sorted({tile[axis + 1] for tile in tiles})
+        for end, next_start in zip(ends, starts[1:]):
+            assert end - next_start >= overlap
+
+
+@pytest.mark.parametrize("pyramid", [False, True])
+@pytest.mark.parametrize("merge", [False, True])
+def test_tile_masks_are_full_mask_slices(regional_prompting, pyramid, merge):
+    inputs = dict(region_boxes=json.dumps(BOXES), merge_duplicate_regions=merge, mask_pyramid=pyramid,
+                  feather_width=6, **PROMPTS)
+    clip = TinyCLIP()
+    (full,) = regional_prompting.EasyRegionMask().encode_regions_mask(
+        clip, WIDTH, HEIGHT, 1.0, True, "city street at night", extra_pnginfo=None, unique_id="0", **inputs)
+    conditionings, positions = regional_prompting.EasyRegionMaskTiled().encode_regions_tiled(
+        clip, WIDTH, HEIGHT, 1.0, True, "city street at night", extra_pnginfo=None, unique_id="0",
+        tile_size=512, tile_overlap=128, **inputs)
+
+    tiles = tile_grid((HEIGHT // 8, WIDTH // 8), 64, 16)
+    assert len(conditionings) == len(positions) == len(tiles) == 6
+    for tile, conditioning, position in zip(tiles, conditionings, positions):
+        y0, y1, x0, x1 = tile
+        assert json.loads(position) == [x0 * 8, y0 * 8, (x1 - x0) * 8, (y1 - y0) * 8]
+
+        # Regions with nothing in the tile are dropped, everything else keeps its order
+        expected = []
+        for cond, options in full:
+            if "mask" not in options:
+                expected.append((cond, options, None))
+                continue
+            full_slice = options["mask"].to("cpu")[:, y0:y1, x0:x1]
+            if bool(full_slice.any()):
+                expected.append((cond, options, full_slice))
+        assert len(conditioning) == len(expected)
+
+        for (cond, options), (full_cond, full_options, full_slice) in zip(conditioning, expected):
+            assert cond is full_cond
+            if full_slice is None:
+                assert "mask" not in options
+                continue
+            assert torch.equal(options["mask"].to("cpu"), full_slice)
+            assert options["mask_strength"] == full_options["mask_strength"]
+            if pyramid:
+                assert set(options["mask_pyramid"]) == {
+                    tuple(level.shape[-2:]) for level in mask_pyramid(full_slice).values()}
+
+            attention, full_attention = options["attention_mask"], full_options["attention_mask"]
+            assert options["attention_mask_img_shape"] == (y1 - y0, x1 - x0)
+            assert attention.txt_tokens == full_attention.txt_tokens
+            assert torch.equal(attention.region_map(), full_attention.region_map()[y0:y1, x0:x1])